@@ -1,18 +1,310 @@
 from pathlib import Path
+from collections import deque
+import asyncio
+import io
+import os
+import tempfile
+import time
 import pandas as pd
-import seaborn as sns
-from shiny import App, Inputs, Outputs, Session, reactive, render, ui
-from joblib import load
+from shiny import App, Inputs, Outputs, Session, reactive, render, run_app, ui
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Mount, Route
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.ticker as ticker
-
-sns.set_theme(style="white")
+from data.catalog import built_from, file_sha1, load_catalog, read_manifest, read_slider_metadata, slider_metadata
+from data.schema import compact_catalog, value_counts, size_order, widen_floats
+from data.star_index import StarIndex
+from data.sky_index import SkyIndex
+from data.constellations import constellation_positions, constellation_stats
+from plot_cache import PlotCache, prewarm
+from registry import Registry
+from coalesce import CoalesceStats, coalesced
+from plots import STAR_PLOTS, star_plot_png, constellation_counts_png, render_hooks
+from render_pool import RenderPool
+from models.batch import batch_format, stream_predictions
 
 base_path = Path(__file__).parent
-scaler = load(base_path / "models" / "scaler.joblib")
-knn = load(base_path / "models" / "knn_model.joblib")
-data = pd.read_csv(base_path / "data" / "cleaned_data.csv")
+models_path = base_path / "models"
+
+# Set CELESTIAL_PREDICTOR=spherical to predict with neighbours found by
+# angular separation (models/spherical_knn.npz) instead of the scaled
+# (RA, Dec) KNN. Both take raw right_ascension/declination rows. Models are
+# loaded on the first prediction, so sessions that never predict don't pay
+# for them.
+PREDICTOR = os.environ.get('CELESTIAL_PREDICTOR', 'flat')
+
+
+def load_model():
+    # Answers for every slider position, compiled by models/knn.py.
+    # Inputs off the grid fall back to the live predictor.
+    lookup = None
+    lookup_path = models_path / f"prediction_lookup_{PREDICTOR}.npz"
+    if lookup_path.exists():
+        from models.lookup import PredictionLookup
+        lookup = PredictionLookup.load(lookup_path)
+
+    if PREDICTOR == 'spherical':
+        from models.spherical import SphericalKNN
+        predictor = SphericalKNN.load(models_path / "spherical_knn.npz")
+    elif (models_path / "knn_compact").exists():
+        from models.compact import CompactKNN
+        predictor = CompactKNN.load(models_path / "knn_compact")
+    else:
+        from joblib import load
+        from sklearn.pipeline import make_pipeline
+        predictor = make_pipeline(load(models_path / "scaler.joblib"),
+                                  load(models_path / "knn_model.joblib"))
+    return {'predictor': predictor, 'lookup': lookup}
+
+
+def warm_model(model):
+    # The first predict_proba pays for imports and page faults; do that
+    # before the model is swapped in rather than in a user's request.
+    model['predictor'].predict_proba(pd.DataFrame({'right_ascension': [12.0],
+                                                   'declination': [0.0]}))
+
+
+# data/clean_data.py writes the catalog as CSV and, with --catalog, as
+# memory-mappable columns too; the CSV is only parsed when the binary catalog is missing or was
+# built from a different CSV.
+catalog_path = base_path / "data" / "catalog"
+csv_path = base_path / "data" / "cleaned_data.csv"
+# Slider bounds and defaults, written by data/clean_data.py --catalog so
+# they don't have to be computed from the catalog on every start.
+slider_path = base_path / "data" / "slider_metadata.json"
+
+# How many of the catalog's stars closest to a predicted star the
+# Prediction page lists.
+NEAREST_STARS = int(os.environ.get('CELESTIAL_NEAREST_STARS', 5))
+
+
+def load_catalog_version():
+    """The catalog and everything the pages derive from it."""
+    # The CSV is hashed at most once, and only if its modification time
+    # changed since the catalog or the sidecar were built.
+    hashes = {}
+    manifest = read_manifest(catalog_path)
+    if manifest is not None and built_from(manifest.get('source'), csv_path, hashes):
+        data, version = load_catalog(catalog_path)
+    else:
+        data = compact_catalog(pd.read_csv(csv_path))
+        version = file_sha1(csv_path, hashes)[:12]
+    sliders = read_slider_metadata(slider_path, csv_path, hashes)
+    if sliders is None:
+        sliders = slider_metadata(data)
+    return {
+        'data': data,
+        'version': version,
+        'index': StarIndex(data),
+        'sky': SkyIndex(data),
+        'partitions': constellation_positions(data),
+        'sliders': sliders,
+        'stats': constellation_stats(data),
+    }
+
+
+def current_catalog():
+    return registry.get('catalog')
+
+
+def load_predictor():
+    return registry.get('model')['predictor']
+
+
+# The Statistical Data grid sends CELESTIAL_GRID_PAGE_SIZE rows at a time,
+# with buttons to page through the rest; 0 sends every filtered star.
+GRID_PAGE_SIZE = int(os.environ.get('CELESTIAL_GRID_PAGE_SIZE', 50))
+
+# Changes of the five Constellations-page sliders are coalesced: the
+# outputs are recomputed once the sliders have been still for
+# CELESTIAL_SLIDER_DEBOUNCE_MS, with their latest values. 0 recomputes on
+# every change. The counters are served at /api/stats.
+slider_coalescing = CoalesceStats(
+    float(os.environ.get('CELESTIAL_SLIDER_DEBOUNCE_MS', 250)) / 1000)
+
+# Seconds spent in each Constellations-page filter pass, most recent last.
+filter_timings = deque(maxlen=1000)
+
+
+def constellation_stars(catalog, constellation):
+    positions = catalog['partitions'].get(constellation)
+    if positions is None:
+        return catalog['data'].iloc[:0]
+    return catalog['data'].iloc[positions]
+
+
+def constellation_mean(catalog, constellation, column):
+    stats = catalog['stats']
+    if constellation in stats.index:
+        return stats.loc[constellation, (column, 'mean')]
+    return np.nan
+
+
+# Constellations with more stars than CELESTIAL_MAX_PLOT_POINTS are drawn
+# as a histogram ("density") or a downsampled strip plot ("sample"),
+# chosen with CELESTIAL_LARGE_PLOT_MODE.
+STAR_PLOT_OPTIONS = {
+    'max_points': int(os.environ.get('CELESTIAL_MAX_PLOT_POINTS', 5000)),
+    'large_mode': os.environ.get('CELESTIAL_LARGE_PLOT_MODE', 'density'),
+}
+
+
+def predict_constellation(ra, dec):
+    model = registry.get('model')
+    predictor = model['predictor']
+    if model['lookup'] is not None:
+        hit = model['lookup'].get(ra, dec)
+        if hit is not None:
+            return hit
+
+    test_data = pd.DataFrame({
+        'right_ascension': [ra],
+        'declination': [dec]
+    })
+    predictions = predictor.predict(test_data)
+    prediction_prob = predictor.predict_proba(test_data)[0]
+
+    class_probabilities = {}
+    for idx, prob in enumerate(prediction_prob):
+        if prob > 0.05:
+            class_probabilities[predictor.classes_[idx]] = prob
+    return predictions[0], class_probabilities
+
+
+def nearest_stars(catalog, ra, dec, n=NEAREST_STARS):
+    """The ``n`` catalog stars closest to ``(ra, dec)`` as ``(name,
+    constellation, separation in degrees)``, closest first."""
+    distances, positions = catalog['sky'].nearest(ra, dec, n)
+    stars = catalog['data'].iloc[positions]
+    return list(zip(stars['name'], stars['constellation'], distances))
+
+
+def render_star_plot(catalog, constellation, attribute):
+    return star_plot_png(constellation_stars(catalog, constellation), constellation,
+                         attribute, constellation_mean(catalog, constellation, attribute),
+                         **STAR_PLOT_OPTIONS)
+
+
+def png_image(png):
+    # PIL is only needed once a plot is shown.
+    from PIL import Image
+    return Image.open(io.BytesIO(png))
+
+
+# Set CELESTIAL_FIGURE_STATS to print live figure count and process memory
+# after every render.
+if os.environ.get('CELESTIAL_FIGURE_STATS'):
+    render_hooks.append(print)
+
+# Plot rendering runs on this pool so it never blocks the event loop for
+# other sessions. CELESTIAL_RENDER_BACKEND is "thread" or "process" and
+# CELESTIAL_RENDER_WORKERS caps how many renders run at once.
+render_pool = RenderPool(
+    backend=os.environ.get('CELESTIAL_RENDER_BACKEND', 'thread'),
+    max_workers=int(os.environ.get('CELESTIAL_RENDER_WORKERS', 2)))
+
+# Rendered Stars-page plots shared by every session, keyed by
+# (constellation, attribute, catalog_version). Set CELESTIAL_PREWARM_PLOTS
+# to render every constellation in the background at startup and whenever
+# a new catalog is swapped in.
+plot_cache = PlotCache(
+    max_bytes=int(os.environ.get('CELESTIAL_PLOT_CACHE_MB', 64)) * 1024 * 1024)
+
+
+# Constellations-page results shared by every session: the summary
+# (counts per constellation, total and average distance) and the bar chart,
+# keyed by the five slider ranges and the catalog version. The ranges are
+# rounded to CELESTIAL_QUERY_CACHE_DIGITS decimals and the stars filtered
+# with the rounded values, so every session sharing a key sees the same
+# answer; the default 4 is finer than any slider step and only drops float
+# noise, fewer digits share results between nearby ranges.
+QUERY_CACHE_DIGITS = int(os.environ.get('CELESTIAL_QUERY_CACHE_DIGITS', 4))
+
+
+def query_result_bytes(result):
+    if isinstance(result, bytes):
+        return len(result)
+    return int(result['counts'].memory_usage(deep=True)) + 256
+
+
+query_cache = PlotCache(
+    max_bytes=int(os.environ.get('CELESTIAL_QUERY_CACHE_MB', 16)) * 1024 * 1024,
+    sizeof=query_result_bytes)
+
+
+def rounded_ranges(ranges):
+    return {column: tuple(round(float(bound), QUERY_CACHE_DIGITS) for bound in bounds)
+            for column, bounds in ranges.items()}
+
+
+def prewarm_plots(catalog):
+    return prewarm(plot_cache, [
+        ((constellation, attribute, catalog['version']),
+         lambda constellation=constellation, attribute=attribute:
+             render_star_plot(catalog, constellation, attribute))
+        for constellation in catalog['partitions']
+        for attribute in STAR_PLOTS
+    ])
+
+
+def warm_catalog(catalog):
+    # With CELESTIAL_PREWARM_PLOTS a new catalog's plots are rendered before
+    # it is swapped in, so nobody waits for them.
+    if os.environ.get('CELESTIAL_PREWARM_PLOTS'):
+        prewarm_plots(catalog).join()
+
+
+# Every running session's generation counters, set by notify_sessions when
+# an artifact is swapped, and the event loop the sessions run on.
+session_generations = {}
+session_loop = None
+
+
+def notify_sessions(name):
+    # Swaps happen on the registry's watch thread; the sessions' reactive
+    # values are set on their event loop, then flushed once for all of them.
+    async def bump():
+        async with reactive.lock():
+            for generations in list(session_generations.values()):
+                generations[name].set(registry.generation(name))
+            await reactive.flush()
+
+    if session_generations and session_loop is not None:
+        asyncio.run_coroutine_threadsafe(bump(), session_loop)
+
+
+def on_swap(name, old, new):
+    if name == 'catalog':
+        plot_cache.invalidate(keep=lambda key: key[-1] == new['version'])
+        query_cache.invalidate(keep=lambda key: key[-1] == new['version'])
+    notify_sessions(name)
+    print(f"Reloaded {name}, generation {registry.generation(name)}"
+          + (f", version {new['version']}" if name == 'catalog' else ""))
+
+
+# The catalog and the model are swapped for new versions while the app
+# runs whenever data/clean_data.py or models/knn.py rewrite them; set
+# CELESTIAL_HOT_RELOAD=0 to load them once. Sessions are told of a swap as
+# it happens, so idle sessions send nothing in between.
+registry = Registry()
+registry.register('catalog', load_catalog_version,
+                  [catalog_path, csv_path, slider_path],
+                  version=lambda catalog: catalog['version'],
+                  warm=warm_catalog)
+registry.register('model', load_model,
+                  [models_path / name for name in [
+                      "knn_compact", "scaler.joblib", "knn_model.joblib", "spherical_knn.npz",
+                      f"prediction_lookup_{PREDICTOR}.npz"]],
+                  lazy=True, warm=warm_model)
+registry.subscribe(on_swap)
+if os.environ.get('CELESTIAL_PREWARM_PLOTS'):
+    prewarm_plots(registry.get('catalog'))
+if os.environ.get('CELESTIAL_HOT_RELOAD', '1') != '0':
+    registry.watch()
+
+# The sliders start from the catalog loaded at startup; sessions move their
+# bounds when a new catalog is swapped in.
+sliders = current_catalog()['sliders']
 
 
 page_a_content = ui.page_fluid(
@@ -48,42 +340,37 @@ page_a_content = ui.page_fluid(
         ui.input_slider(
             "ra",
             "Right Ascension",
-            round(data['right_ascension'].min(), 2),
-            round(data['right_ascension'].max(), 2),
-            [round(data['right_ascension'].quantile(0.25), 2),
-             round(data['right_ascension'].quantile(0.75), 2)],
+            sliders['right_ascension']['min'],
+            sliders['right_ascension']['max'],
+            sliders['right_ascension']['value'],
         ),
         ui.input_slider(
             "dec",
             "Declination",
-            round(data['declination'].min(), 2),
-            round(data['declination'].max(), 2),
-            [round(data['declination'].quantile(0.25), 2),
-             round(data['declination'].quantile(0.75), 2)],
+            sliders['declination']['min'],
+            sliders['declination']['max'],
+            sliders['declination']['value'],
         ),
         ui.input_slider(
             "appmag",
             "Apparent Magnitude",
-            round(data['apparent_magnitude'].min(), 2),
-            round(data['apparent_magnitude'].max(), 2),
-            [round(data['apparent_magnitude'].quantile(0.25), 2),
-             round(data['apparent_magnitude'].quantile(0.75), 2)],
+            sliders['apparent_magnitude']['min'],
+            sliders['apparent_magnitude']['max'],
+            sliders['apparent_magnitude']['value'],
         ),
         ui.input_slider(
             "absmag",
             "Absolute Magnitude",
-            round(data['absolute_magnitude'].min(), 2),
-            round(data['absolute_magnitude'].max(), 2),
-            [round(data['absolute_magnitude'].quantile(0.25), 2),
-             round(data['absolute_magnitude'].quantile(0.75), 2)],
+            sliders['absolute_magnitude']['min'],
+            sliders['absolute_magnitude']['max'],
+            sliders['absolute_magnitude']['value'],
         ),
         ui.input_slider(
             "dist",
             "Distance",
-            round(data['distance_light_year'].min(), 2),
-            round(data['distance_light_year'].max(), 2),
-            [round(data['distance_light_year'].quantile(0.25), 2),
-             round(data['distance_light_year'].quantile(0.75), 2)],
+            sliders['distance_light_year']['min'],
+            sliders['distance_light_year']['max'],
+            sliders['distance_light_year']['value'],
         ),
 
     ),
@@ -115,6 +402,12 @@ page_a_content = ui.page_fluid(
         ui.card(
         ui.card_header("Statistical Data"),
         ui.output_data_frame("constdata"),
+        *([ui.div(
+            ui.input_action_button("grid_previous", "‹ Previous", class_="btn-sm"),
+            ui.output_text("grid_window", inline=True),
+            ui.input_action_button("grid_next", "Next ›", class_="btn-sm"),
+            class_="d-flex justify-content-between align-items-center",
+        )] if GRID_PAGE_SIZE else []),
     )
     )
 )
@@ -222,6 +515,7 @@ page_c_content = ui.page_fluid(
                     <li><strong>Enter a Star Name:</strong> Choose a name for your star. It can be real or fictional!</li>
                     <li><strong>Set Coordinates:</strong> Use the sliders to specify the right ascension (0 to 24 hours) and declination (-90 to 90 degrees) of your star.</li>
                     <li><strong>Predict Constellation:</strong> Click 'Submit' to see the predicted constellation based on your inputs.</li>
+                    <li><strong>Nearest Known Stars:</strong> The results also list the catalog's stars closest to your star on the sky.</li>
                 </ul>
                 <h5><u>Behind the Scenes:</u></h5>
                 <p>The model employs the K-Nearest Neighbors (KNN) machine learning algorithm, a simple yet powerful method used widely in classification tasks. KNN works by finding the closest training examples in the feature space and making predictions based on their classifications. This model was trained on a dataset of 3,994 records and achieved a 94% accuracy on the test set.</p>
@@ -243,6 +537,13 @@ page_c_content = ui.page_fluid(
         class_="justify-content-center text-center"
     ),
     ui.output_ui("text"),
+    ui.card(
+        ui.card_header("Classify a List of Stars"),
+        ui.p("Upload a CSV or JSON file with name, right_ascension and declination "
+             "columns to predict the constellation of every star at once."),
+        ui.input_file("batch_file", "Star List", accept=[".csv", ".json", ".ndjson", ".jsonl"]),
+        ui.output_ui("batch_summary"),
+    ),
 )
 
 page_d_content = ui.page_fluid(
@@ -292,111 +593,74 @@ app_ui = ui.page_navbar(
 
 
 def server(input: Inputs, output: Outputs, session: Session):
-    @render.plot
-    @reactive.event(input.constellation_select)
-    def sra():
+    # The catalog and model in use. When the registry swaps in a new
+    # version these change and everything computed from them is redone.
+    global session_loop
+    session_loop = asyncio.get_running_loop()
+    generations = {name: reactive.Value(registry.generation(name))
+                   for name in ['catalog', 'model']}
+    session_generations[session] = generations
+    session.on_ended(lambda: session_generations.pop(session, None))
+    model_generation = generations['model']
+
+    @reactive.calc
+    def catalog():
+        generations['catalog']()
+        return current_catalog()
+
+    @reactive.effect
+    @reactive.event(catalog, ignore_init=True)
+    def update_slider_bounds():
+        for input_id, column in [('ra', 'right_ascension'), ('dec', 'declination'),
+                                 ('appmag', 'apparent_magnitude'),
+                                 ('absmag', 'absolute_magnitude'),
+                                 ('dist', 'distance_light_year')]:
+            bounds = catalog()['sliders'][column]
+            ui.update_slider(input_id, min=bounds['min'], max=bounds['max'])
+
+    async def star_plot(attribute):
         constellation = input.constellation_select()
         if constellation:
-            filtered_data = data[data['constellation'] == constellation]
-            avg_declination = filtered_data['right_ascension'].mean()
-
-            plt.figure(figsize=(10, 5))
-            sns.stripplot(x='right_ascension', data=filtered_data,
-                          jitter=True, size=3)
-
-            plt.title('Right Ascension of stars in ' + constellation)
-            plt.xlabel('Right Ascension (hour)')
-            plt.grid()
-
-            plt.axvline(avg_declination, color='red', linestyle='--',
-                        label=f'Average Right Ascension: {avg_declination:.2f}')
-            plt.legend()
-
-            return plt.gcf()
+            current = catalog()
+            key = (constellation, attribute, current['version'])
+            png = plot_cache.get(key)
+            if png is None:
+                png = await render_pool.run(
+                    star_plot_png, constellation_stars(current, constellation), constellation,
+                    attribute, constellation_mean(current, constellation, attribute),
+                    **STAR_PLOT_OPTIONS)
+                plot_cache.put(key, png)
+            return png_image(png)
 
     @render.plot
-    @reactive.event(input.constellation_select)
-    def sdec():
-        constellation = input.constellation_select()
-        if constellation:
-            filtered_data = data[data['constellation'] == constellation]
-            avg_declination = filtered_data['declination'].mean()
-
-            plt.figure(figsize=(10, 5))
-            sns.stripplot(x='declination', data=filtered_data,
-                          jitter=True, size=3)
-
-            plt.title('Declination of stars in ' + constellation)
-            plt.xlabel('Declination (degrees)')
-            plt.grid()
+    @reactive.event(input.constellation_select, catalog)
+    async def sra():
+        return await star_plot('right_ascension')
 
-            plt.axvline(avg_declination, color='red', linestyle='--',
-                        label=f'Average Declination: {avg_declination:.2f}')
-            plt.legend()
-
-            return plt.gcf()
+    @render.plot
+    @reactive.event(input.constellation_select, catalog)
+    async def sdec():
+        return await star_plot('declination')
 
     @render.plot
-    @reactive.event(input.constellation_select)
-    def sabsmag():
-        constellation = input.constellation_select()
-        if constellation:
-            filtered_data = data[data['constellation'] == constellation]
-            avg_declination = filtered_data['absolute_magnitude'].mean()
-
-            plt.figure(figsize=(10, 5))
-            sns.stripplot(x='absolute_magnitude',
-                          data=filtered_data, jitter=True, size=3)
-            plt.title('Absolute Magnitude of stars in ' + constellation)
-            plt.xlabel('Absolute Magnitude')
-            plt.grid()
-            plt.axvline(avg_declination, color='red', linestyle='--',
-                        label=f'Average Absolute Magnitude: {avg_declination:.2f}')
-            plt.legend()
-            return plt.gcf()
+    @reactive.event(input.constellation_select, catalog)
+    async def sabsmag():
+        return await star_plot('absolute_magnitude')
 
     @render.plot
-    @reactive.event(input.constellation_select)
-    def sappmag():
-        constellation = input.constellation_select()
-        if constellation:
-            filtered_data = data[data['constellation'] == constellation]
-            avg_declination = filtered_data['apparent_magnitude'].mean()
-
-            plt.figure(figsize=(10, 5))
-            sns.stripplot(x='apparent_magnitude',
-                          data=filtered_data, jitter=True, size=3)
-            plt.title('Apparent Magnitude of stars in ' + constellation)
-            plt.xlabel('Apparent Magnitude')
-            plt.grid()
-            plt.axvline(avg_declination, color='red', linestyle='--',
-                        label=f'Average Apparent Magnitude: {avg_declination:.2f}')
-            plt.legend()
-            return plt.gcf()
+    @reactive.event(input.constellation_select, catalog)
+    async def sappmag():
+        return await star_plot('apparent_magnitude')
 
     @render.plot
-    @reactive.event(input.constellation_select)
-    def sdist():
-        constellation = input.constellation_select()
-        if constellation:
-            filtered_data = data[data['constellation'] == constellation]
-            avg_declination = filtered_data['distance_light_year'].mean()
-
-            plt.figure(figsize=(10, 5))
-            sns.stripplot(x='distance_light_year',
-                          data=filtered_data, jitter=True, size=3)
-            plt.title('Distance from Earth of stars in ' + constellation)
-            plt.xlabel('Distance from Earth (light years)')
-            plt.grid()
-            plt.axvline(avg_declination, color='red', linestyle='--',
-                        label=f'Average Distance from Earth: {avg_declination:.2f} light years')
-            plt.legend()
-            return plt.gcf()
+    @reactive.event(input.constellation_select, catalog)
+    async def sdist():
+        return await star_plot('distance_light_year')
 
     def get_stars():
         constellation = input.constellation_select()
         if constellation:
-            filtered_data = data[data['constellation'] == constellation]
+            filtered_data = constellation_stars(catalog(), constellation)
             return {row: row for row in filtered_data['name'].unique()}
         else:
             return {}
@@ -406,44 +670,69 @@ def server(input: Inputs, output: Outputs, session: Session):
         stars = get_stars()
         return (ui.input_selectize("selectize", "Stars in Constellation: ", choices=stars, multiple=True))
 
+    grid_page = reactive.Value(0)
+
+    @reactive.calc
+    def slider_inputs():
+        return rounded_ranges({
+            'right_ascension': input.ra(),
+            'declination': input.dec(),
+            'apparent_magnitude': input.appmag(),
+            'absolute_magnitude': input.absmag(),
+            'distance_light_year': input.dist(),
+        })
+
+    slider_ranges = coalesced(slider_inputs, slider_coalescing)
+
+    @reactive.calc
+    def filtered_stars():
+        current = catalog()
+        start = time.perf_counter()
+        positions = current['index'].query(slider_ranges())
+        filtered_data = current['data'].iloc[positions]
+        constellation_counts = value_counts(filtered_data['constellation'])
+        elapsed = time.perf_counter() - start
+        filter_timings.append(elapsed)
+
+        return {
+            'positions': positions,
+            'data': filtered_data,
+            'counts': constellation_counts,
+            'elapsed': elapsed,
+        }
+
+    def query_key(kind):
+        return (kind, *slider_ranges().items(), catalog()['version'])
+
+    def summarize():
+        result = filtered_stars()
+        counts = result['counts']
+        total = len(result['data'])
+        average = (result['data']['distance_light_year'].to_numpy(dtype=np.float64).mean()
+                   if total else None)
+
+        return {
+            'counts': counts,
+            'total': total,
+            'average_distance': average,
+        }
+
+    @reactive.calc
+    def constellation_summary():
+        return query_cache.get_or_render(query_key('summary'), summarize)
+
     @render.text
-    @reactive.event(input.ra, input.dec, input.appmag, input.absmag, input.dist)
+    @reactive.event(slider_ranges, catalog)
     def total_stars():
-        ra_range = input.ra()
-        dec_range = input.dec()
-        appmag_range = input.appmag()
-        absmag_range = input.absmag()
-        dist_range = input.dist()
-
-        filtered_data = data[
-            (data['right_ascension'].between(*ra_range)) &
-            (data['declination'].between(*dec_range)) &
-            (data['apparent_magnitude'].between(*appmag_range)) &
-            (data['absolute_magnitude'].between(*absmag_range)) &
-            (data['distance_light_year'].between(*dist_range))
-        ]
-        total_stars = len(filtered_data)
+        total_stars = constellation_summary()['total']
         return total_stars
 
     @render.text
-    @reactive.event(input.ra, input.dec, input.appmag, input.absmag, input.dist)
+    @reactive.event(slider_ranges, catalog)
     def most_significant_constellation():
-        ra_range = input.ra()
-        dec_range = input.dec()
-        appmag_range = input.appmag()
-        absmag_range = input.absmag()
-        dist_range = input.dist()
-
-        filtered_data = data[
-            (data['right_ascension'].between(*ra_range)) &
-            (data['declination'].between(*dec_range)) &
-            (data['apparent_magnitude'].between(*appmag_range)) &
-            (data['absolute_magnitude'].between(*absmag_range)) &
-            (data['distance_light_year'].between(*dist_range))
-        ]
-        if not filtered_data.empty:
-            constellation_counts = filtered_data['constellation'].value_counts(
-            )
+        summary = constellation_summary()
+        if summary['total']:
+            constellation_counts = summary['counts']
             most_significant_constellation = constellation_counts.idxmax()
             count_in_constellation = constellation_counts[most_significant_constellation]
             return f"{most_significant_constellation} ({count_in_constellation})"
@@ -451,94 +740,72 @@ def server(input: Inputs, output: Outputs, session: Session):
             return "N/A"
 
     @render.text
-    @reactive.event(input.ra, input.dec, input.appmag, input.absmag, input.dist)
+    @reactive.event(slider_ranges, catalog)
     def average_distance():
-        ra_range = input.ra()
-        dec_range = input.dec()
-        appmag_range = input.appmag()
-        absmag_range = input.absmag()
-        dist_range = input.dist()
-
-        filtered_data = data[
-            (data['right_ascension'].between(*ra_range)) &
-            (data['declination'].between(*dec_range)) &
-            (data['apparent_magnitude'].between(*appmag_range)) &
-            (data['absolute_magnitude'].between(*absmag_range)) &
-            (data['distance_light_year'].between(*dist_range))
-        ]
-        average_distance = round(filtered_data['distance_light_year'].mean(
-        ), 2) if not filtered_data.empty else 0
+        average = constellation_summary()['average_distance']
+        average_distance = round(average, 2) if average is not None else 0
 
         return f"{average_distance} light years"
 
     @render.plot
-    @reactive.event(input.ra, input.dec, input.appmag, input.absmag, input.dist)
-    def constplot():
-        ra_range = input.ra()
-        dec_range = input.dec()
-        appmag_range = input.appmag()
-        absmag_range = input.absmag()
-        dist_range = input.dist()
-
-        filtered_data = data[
-            (data['right_ascension'].between(*ra_range)) &
-            (data['declination'].between(*dec_range)) &
-            (data['apparent_magnitude'].between(*appmag_range)) &
-            (data['absolute_magnitude'].between(*absmag_range)) &
-            (data['distance_light_year'].between(*dist_range))
-        ]
-        constellation_counts = filtered_data['constellation'].value_counts(
-        ).reset_index()
-        constellation_counts.columns = ['constellation', 'count']
-
-        constellation_counts = constellation_counts[constellation_counts['count'] > 0]
-
-        fig, ax = plt.subplots()
-
-        barplot = sns.barplot(
-            x='constellation', y='count', hue='constellation', data=constellation_counts, palette='viridis', legend=False
-        )
-        ax.set_title('Number of Stars per Constellation')
-        ax.set_xlabel('Constellation')
-        ax.set_ylabel('Number of Stars')
-        max_count = constellation_counts['count'].max()
-        ax.set_ylim(0, max_count * 1.1)
-
-        ax.set_xticks(range(len(constellation_counts['constellation'])))
-        ax.set_xticklabels(
-            constellation_counts['constellation'], rotation=45, ha='right')
-
-        plt.grid()
-        for p in ax.patches:
-            ax.annotate(format(p.get_height(), '.0f'),
-                        (p.get_x() + p.get_width() / 2., p.get_height()),
-                        ha='center', va='center',
-                        xytext=(0, 5),
-                        textcoords='offset points',
-                        fontsize=9)
-        return fig
+    @reactive.event(slider_ranges, catalog)
+    async def constplot():
+        key = query_key('constplot')
+        png = query_cache.get(key)
+        if png is None:
+            constellation_counts = constellation_summary()['counts'].reset_index()
+            constellation_counts.columns = ['constellation', 'count']
+
+            constellation_counts = constellation_counts[constellation_counts['count'] > 0]
+
+            png = await render_pool.run(constellation_counts_png, constellation_counts)
+            query_cache.put(key, png)
+        return png_image(png)
+
+    @reactive.calc
+    def grid_order():
+        # The filtered rows in display order, biggest constellation first,
+        # kept while the user pages through them.
+        return size_order(filtered_stars()['data']['constellation'])
+
+    def grid_pages():
+        return max(1, -(-len(grid_order()) // GRID_PAGE_SIZE))
+
+    if GRID_PAGE_SIZE:
+        # Back to the first page whenever the filter changes; the higher
+        # priority runs this before the grid re-renders.
+        @reactive.effect(priority=1)
+        @reactive.event(grid_order)
+        def first_grid_page():
+            grid_page.set(0)
+
+        @reactive.effect
+        @reactive.event(input.grid_previous)
+        def previous_grid_page():
+            grid_page.set(max(grid_page() - 1, 0))
+
+        @reactive.effect
+        @reactive.event(input.grid_next)
+        def next_grid_page():
+            grid_page.set(min(grid_page() + 1, grid_pages() - 1))
+
+        @render.text
+        def grid_window():
+            total = len(grid_order())
+            if not total:
+                return "No stars match"
+            start = min(grid_page(), grid_pages() - 1) * GRID_PAGE_SIZE
+            return (f"Stars {start + 1:,}–{min(start + GRID_PAGE_SIZE, total):,} of {total:,} "
+                    f"(page {start // GRID_PAGE_SIZE + 1} of {grid_pages():,})")
 
     @render.data_frame
     def constdata():
-        ra_range = input.ra()
-        dec_range = input.dec()
-        appmag_range = input.appmag()
-        absmag_range = input.absmag()
-        dist_range = input.dist()
-
-        filtered_data = data[
-            (data['right_ascension'].between(*ra_range)) &
-            (data['declination'].between(*dec_range)) &
-            (data['apparent_magnitude'].between(*appmag_range)) &
-            (data['absolute_magnitude'].between(*absmag_range)) &
-            (data['distance_light_year'].between(*dist_range))
-        ].copy()
-
-        filtered_data['count'] = filtered_data.groupby(
-            'constellation')['constellation'].transform('count')
-
-        filtered_data = filtered_data.sort_values(by='count', ascending=False)
-        filtered_data = filtered_data.drop(columns=['count'])
+        filtered_data = filtered_stars()['data']
+        order = grid_order()
+        if GRID_PAGE_SIZE:
+            start = min(grid_page(), grid_pages() - 1) * GRID_PAGE_SIZE
+            order = order[start:start + GRID_PAGE_SIZE]
+        filtered_data = widen_floats(filtered_data.iloc[order])
 
         filtered_data = filtered_data.rename(columns={
             'name': 'Star Name',
@@ -556,35 +823,30 @@ def server(input: Inputs, output: Outputs, session: Session):
         return render.DataGrid(filtered_data)
 
     @render.ui
-    @reactive.event(input.submit, ignore_none=False)
+    @reactive.event(input.submit, model_generation, ignore_none=False)
     def text():
         star_name = input.star_name()
         ra = input.right_ascension()
         dec = input.declination()
         if star_name and (ra is not None) and (dec is not None):
-            test_data = pd.DataFrame({
-                'right_ascension': [ra],
-                'declination': [dec]
-            })
-            test_features = scaler.transform(test_data)
-            predictions = knn.predict(test_features)
-            prediction_prob = knn.predict_proba(test_features)[0]
-
-            class_probabilities = {}
-            for idx, prob in enumerate(prediction_prob):
-                if prob > 0.05:
-                    class_probabilities[knn.classes_[idx]] = prob
+            prediction, class_probabilities = predict_constellation(ra, dec)
+            neighbours = nearest_stars(catalog(), ra, dec)
 
             result_text = (
                 f"<ul>"
                 f"<li><b>Your star's name is:</b> {star_name}</li>"
                 f"<li><b>Right ascension:</b> {ra}</li>"
                 f"<li><b>Declination:</b> {dec}</li>"
-                f"<li><b>Predicted Constellation:</b> {predictions[0]}</li>"
+                f"<li><b>Predicted Constellation:</b> {prediction}</li>"
                 f"<li><b>Probabilities of Predictions Constellation Breakdown:</b>"
                 f"<ul>"
                 + "".join(f"<li>{constellation}: {prob*100:.2f}%</li>" for constellation,
                           prob in class_probabilities.items())
+                + f"</ul></li>"
+                f"<li><b>Nearest Known Stars:</b>"
+                f"<ul>"
+                + "".join(f"<li>{name} ({constellation}): {distance:.2f}° away</li>"
+                          for name, constellation, distance in neighbours)
                 + f"</ul></li></ul>"
             )
             return (ui.card(
@@ -593,11 +855,129 @@ def server(input: Inputs, output: Outputs, session: Session):
 
             ))
 
+    # The file holding the latest upload's predictions; removed when the
+    # next upload replaces it and when the session ends.
+    batch_paths = []
+
+    def remove_batch_files():
+        while batch_paths:
+            Path(batch_paths.pop()).unlink(missing_ok=True)
+
+    session.on_ended(remove_batch_files)
+
+    @reactive.calc
+    async def batch_result():
+        remove_batch_files()
+        files = input.batch_file()
+        if not files:
+            return None
+
+        upload = files[0]
+        stats = {}
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False,
+                                         encoding='utf-8') as out:
+            path = out.name
+        batch_paths.append(path)
+
+        def classify():
+            with open(upload['datapath'], encoding='utf-8') as source, \
+                    open(path, 'w', encoding='utf-8') as out:
+                for text in stream_predictions(load_predictor(), source, batch_format(upload['name']),
+                                               stats=stats):
+                    out.write(text)
+
+        try:
+            await asyncio.to_thread(classify)
+        except ValueError as e:
+            remove_batch_files()
+            return {'error': str(e)}
+        return {'path': path, **stats}
+
+    @render.ui
+    async def batch_summary():
+        result = await batch_result()
+        if result is None:
+            return None
+        if 'error' in result:
+            return ui.p(f"Could not classify {input.batch_file()[0]['name']}: {result['error']}")
+        if not result['rows']:
+            return ui.p(f"There are no stars to classify in {input.batch_file()[0]['name']}.")
+        return ui.div(
+            ui.p(f"Classified {result['rows']:,} stars in {result['seconds']:.2f} s "
+                 f"({result['rows_per_second']:,.0f} rows/s)."),
+            ui.download_button("batch_download", "Download Predictions", class_="btn-success"),
+        )
+
+    @render.download(filename="predictions.csv")
+    async def batch_download():
+        result = await batch_result()
+        with open(result['path'], 'rb') as f:
+            while chunk := f.read(64 * 1024):
+                yield chunk
+
+
+# POST a CSV, JSON array or NDJSON body of name/right_ascension/declination
+# rows to /api/predict to stream back predictions as CSV, or as NDJSON with
+# ?format=ndjson (the default for JSON bodies).
+async def batch_predict(request):
+    fmt = batch_format(request.headers.get('content-type', ''))
+    out_fmt = request.query_params.get('format', 'csv' if fmt == 'csv' else 'ndjson')
+
+    upload = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    async for block in request.stream():
+        upload.write(block)
+    upload.seek(0)
+    source = io.TextIOWrapper(upload, encoding='utf-8')
+
+    stats = {}
+    chunks = stream_predictions(load_predictor(), source, fmt, out_fmt, stats=stats)
+    try:
+        # Reading and classifying the first chunk is as slow as any other;
+        # keep it off the event loop too.
+        first = await asyncio.to_thread(next, chunks, '')
+    except ValueError as e:
+        source.close()
+        return PlainTextResponse(str(e), status_code=400)
+
+    def results():
+        try:
+            yield first
+            yield from chunks
+        finally:
+            source.close()
+            if stats:
+                print(f"Batch prediction: {stats['rows']} rows in {stats['seconds']:.2f} s "
+                      f"({stats['rows_per_second']:.0f} rows/s)")
+
+    media_type = 'text/csv' if out_fmt == 'csv' else 'application/x-ndjson'
+    return StreamingResponse(results(), media_type=media_type)
+
+
+# GET /api/stats for this worker's counters: slider events against
+# recomputations, plot and query caches, render pool and loaded
+# catalog/model versions.
+async def server_stats(request):
+    timings = np.array(filter_timings) * 1000
+    return JSONResponse({
+        'sliders': slider_coalescing.stats(),
+        'filter_ms': {'count': len(timings),
+                      'median': float(np.median(timings)) if len(timings) else None},
+        'plot_cache': plot_cache.stats(),
+        'query_cache': query_cache.stats(),
+        'render_pool': render_pool.stats(),
+        'registry': registry.stats(),
+    })
+
 
 def count_species(df, species):
     return df[df["Species"] == species].shape[0]
 
 
-app = App(app_ui, server)
+shiny_app = App(app_ui, server)
+app = Starlette(routes=[
+    Route("/api/predict", batch_predict, methods=["POST"]),
+    Route("/api/stats", server_stats),
+    Mount("/", app=shiny_app),
+])
 if __name__ == "__main__":
-    app.run()
+    run_app(app)
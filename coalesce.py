@@ -0,0 +1,81 @@
+import time
+
+from shiny import reactive, req
+
+
+class CoalesceStats:
+    """Counters shared by every session's coalesced inputs: ``events`` is
+    how many input changes arrived and ``computations`` how many of them
+    were passed on to the outputs. Their ratio tells how much work the
+    debounce window saves."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.events = 0
+        self.computations = 0
+
+    def stats(self):
+        return {
+            'delay_ms': self.delay * 1000,
+            'events': self.events,
+            'computations': self.computations,
+            'superseded': self.events - self.computations,
+            'events_per_computation': self.events / self.computations if self.computations else 0.0,
+        }
+
+
+def coalesced(source, stats):
+    """A reactive calc that follows ``source`` (a reactive function) but
+    only changes once ``source`` has kept the same value for
+    ``stats.delay`` seconds.
+
+    Each change of ``source`` replaces the pending value and restarts the
+    wait, so a burst of changes (a slider being dragged) is passed on once,
+    with the latest value; a value that ends where it started is not passed
+    on at all. The first value is passed on immediately. Must be called
+    inside a session's server function.
+    """
+    settled = reactive.Value(None)
+    pending = {'value': None, 'deadline': None}
+    timer = reactive.Value(0)
+
+    @reactive.effect(priority=1)
+    def receive():
+        value = source()
+        stats.events += 1
+        with reactive.isolate():
+            first = settled() is None
+        if first or stats.delay <= 0:
+            pending['deadline'] = None
+            settle(value)
+        else:
+            pending['value'] = value
+            pending['deadline'] = time.monotonic() + stats.delay
+            with reactive.isolate():
+                timer.set(timer() + 1)
+
+    @reactive.effect(priority=1)
+    def fire():
+        timer()
+        if pending['deadline'] is None:
+            return
+        remaining = pending['deadline'] - time.monotonic()
+        if remaining > 0:
+            reactive.invalidate_later(remaining)
+            return
+        pending['deadline'] = None
+        settle(pending['value'])
+
+    def settle(value):
+        with reactive.isolate():
+            if value != settled():
+                stats.computations += 1
+                settled.set(value)
+
+    @reactive.calc
+    def value():
+        current = settled()
+        req(current is not None)
+        return current
+
+    return value
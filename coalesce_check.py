@@ -0,0 +1,65 @@
+import asyncio
+import sys
+
+from shiny import reactive
+
+from coalesce import CoalesceStats, coalesced
+
+# Drags a simulated range slider through bursts of changes, a few tens of
+# milliseconds apart like a browser sends them, and checks that a coalesced
+# input recomputes once per burst, always with the latest value. Prints
+# events against computations for a few debounce windows. Run from the
+# repository root:
+#     python coalesce_check.py [bursts]
+
+bursts = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+events_per_burst = 20
+gap = 0.03
+
+
+async def drag(delay):
+    stats = CoalesceStats(delay)
+    slider = reactive.Value((0, 10))
+    ranges = coalesced(slider, stats)
+    computed = []
+
+    @reactive.effect
+    def output():
+        computed.append(ranges())
+
+    await reactive.flush()
+    for burst in range(bursts):
+        for step in range(1, events_per_burst + 1):
+            slider.set((burst, 10 + step))
+            await reactive.flush()
+            await asyncio.sleep(gap)
+        # Let go: wait out the window.
+        await asyncio.sleep(delay + 0.05)
+        await reactive.flush()
+        assert computed[-1] == (burst, 10 + events_per_burst), computed[-1]
+    # Moving away and back within the window computes nothing (with a window).
+    slider.set((0, 0))
+    await reactive.flush()
+    slider.set((bursts - 1, 10 + events_per_burst))
+    await reactive.flush()
+    await asyncio.sleep(delay + 0.05)
+    await reactive.flush()
+    output.destroy()
+    return stats, computed
+
+
+async def main():
+    print(f"{'window':>8} {'events':>7} {'computations':>13}")
+    for delay in [0, 0.1, 0.25]:
+        stats, computed = await drag(delay)
+        print(f"{delay * 1000:>6.0f}ms {stats.events:>7} {stats.computations:>13}")
+        assert stats.computations == len(computed)
+        if delay > gap:
+            # The initial value, then one per burst.
+            assert stats.computations == 1 + bursts, stats.stats()
+        else:
+            assert stats.computations == stats.events, stats.stats()
+    print("Coalescing checks passed.")
+
+
+asyncio.run(main())
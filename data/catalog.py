@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .schema import widen_floats
+except ImportError:
+    from schema import widen_floats
+
+# Columns with a range slider on the Constellations page.
+SLIDER_COLUMNS = [
+    'right_ascension',
+    'declination',
+    'apparent_magnitude',
+    'absolute_magnitude',
+    'distance_light_year',
+]
+
+
+def file_sha1(path, hashes=None):
+    """SHA-1 of the file at ``path``, read in blocks so memory stays flat
+    however big the file is. ``hashes``, a dict shared by the checks of one
+    load, keeps every file to one read."""
+    path = Path(path).resolve()
+    if hashes is not None and path in hashes:
+        return hashes[path]
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        while block := f.read(1024 * 1024):
+            digest.update(block)
+    if hashes is not None:
+        hashes[path] = digest.hexdigest()
+    return digest.hexdigest()
+
+
+def source_fingerprint(path, hashes=None):
+    """Size, modification time and SHA-1 of the file a catalog or sidecar
+    is built from.
+
+    Recorded next to what was built so a reader can tell whether it is still
+    current: by size and time when neither changed, by content otherwise,
+    since a checkout or a copy gives files new modification times in any
+    order.
+    """
+    stat = Path(path).stat()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'sha1': file_sha1(path, hashes)}
+
+
+def built_from(recorded, source, hashes=None):
+    """Whether ``recorded`` (a ``source_fingerprint``) matches the file
+    ``source`` as it is now. The file is only hashed if its size matches
+    but its modification time does not; ``hashes`` is as for
+    ``file_sha1``."""
+    source = Path(source)
+    if recorded is None or not source.exists():
+        return False
+    stat = source.stat()
+    if recorded['size'] != stat.st_size:
+        return False
+    if recorded.get('mtime_ns') == stat.st_mtime_ns:
+        return True
+    return recorded['sha1'] == file_sha1(source, hashes)
+
+
+def write_catalog(df, directory, source=None):
+    """Write ``df`` as a binary columnar catalog.
+
+    Every numeric column becomes its own ``.npy`` file in its current dtype.
+    Text and categorical columns are dictionary encoded: the sorted distinct
+    values (or the categories) go to ``<column>.dict.npy`` and an ``int32``
+    code per row to ``<column>.codes.npy``, with ``-1`` for missing values.
+    ``manifest.json`` records the column order, how each column is stored,
+    the row count and a content hash used as the catalog version, and, if
+    ``source`` names the file ``df`` was read from, its
+    ``source_fingerprint``.
+
+    The files are written to a sibling ``.part`` directory that then
+    replaces ``directory`` whole. A running app that has the old catalog
+    memory-mapped keeps reading it (its files are unlinked, never
+    overwritten), and nothing ever sees a mix of old and new columns.
+    """
+    target = Path(directory)
+    directory = target.with_name(target.name + '.part')
+    shutil.rmtree(directory, ignore_errors=True)
+    directory.mkdir(parents=True)
+    digest = hashlib.sha1()
+    columns = []
+    for name in df.columns:
+        values = df[name]
+        if pd.api.types.is_numeric_dtype(values):
+            array = np.ascontiguousarray(values.to_numpy())
+            np.save(directory / f'{name}.npy', array)
+            columns.append({'name': name, 'kind': 'numeric'})
+            digest.update(array.tobytes())
+        else:
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+            else:
+                codes, uniques = pd.factorize(values, sort=True)
+            dictionary = np.asarray(uniques, dtype=str)
+            codes = codes.astype(np.int32)
+            np.save(directory / f'{name}.codes.npy', codes)
+            np.save(directory / f'{name}.dict.npy', dictionary)
+            columns.append({'name': name, 'kind': 'dictionary',
+                            'categorical': isinstance(values.dtype, pd.CategoricalDtype)})
+            digest.update(codes.tobytes())
+            digest.update('\0'.join(dictionary).encode())
+
+    manifest = {'rows': len(df), 'columns': columns, 'version': digest.hexdigest()[:12]}
+    if source is not None:
+        manifest['source'] = source_fingerprint(source)
+    with open(directory / 'manifest.json', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    _replace_directory(directory, target)
+    return manifest
+
+
+def _replace_directory(source, target):
+    """Move the directory ``source`` to ``target``, replacing it."""
+    previous = target.with_name(target.name + '.old')
+    shutil.rmtree(previous, ignore_errors=True)
+    if target.exists():
+        os.replace(target, previous)
+    os.replace(source, target)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+def read_manifest(directory):
+    """The ``manifest.json`` of the catalog in ``directory``, or None if
+    there is none."""
+    try:
+        with open(Path(directory) / 'manifest.json') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def load_catalog(directory, mmap_mode='r'):
+    """Load a catalog written by ``write_catalog`` as ``(DataFrame, version)``.
+
+    Numeric columns are memory-mapped read-only and wrapped without a copy,
+    so every process that loads the same catalog shares one physical copy
+    through the page cache. Columns that were categorical when written come
+    back as categoricals over the mapped codes; other dictionary-encoded
+    columns are decoded into ordinary object columns.
+    """
+    directory = Path(directory)
+    manifest = read_manifest(directory)
+    if manifest is None:
+        raise FileNotFoundError(directory / 'manifest.json')
+
+    columns = {}
+    for column in manifest['columns']:
+        name = column['name']
+        if column['kind'] == 'numeric':
+            columns[name] = np.load(directory / f'{name}.npy', mmap_mode=mmap_mode).view(np.ndarray)
+        else:
+            codes = np.load(directory / f'{name}.codes.npy', mmap_mode=mmap_mode)
+            dictionary = np.load(directory / f'{name}.dict.npy').astype(object)
+            if column['categorical']:
+                columns[name] = pd.Categorical.from_codes(codes.view(np.ndarray), dictionary)
+            else:
+                values = dictionary[np.maximum(codes, 0)] if len(dictionary) else \
+                    np.full(len(codes), np.nan, dtype=object)
+                values[np.asarray(codes) < 0] = np.nan
+                columns[name] = values
+    return pd.DataFrame(columns, copy=False), manifest['version']
+
+
+def slider_metadata(df, columns=SLIDER_COLUMNS):
+    """Bounds and default range of every slider: ``{column: {'min', 'max',
+    'value': [q25, q75]}}``, rounded to two decimals like the UI shows
+    them. float32 columns are read as the decimals they were stored from."""
+    values = widen_floats(df[columns])
+    # Rounded as numpy scalars, which the sliders have always used.
+    return {column: {
+        'min': float(round(values[column].min(), 2)),
+        'max': float(round(values[column].max(), 2)),
+        'value': [float(round(values[column].quantile(0.25), 2)),
+                  float(round(values[column].quantile(0.75), 2))],
+    } for column in columns}
+
+
+def write_slider_metadata(df, path, columns=SLIDER_COLUMNS, source=None):
+    """Write ``slider_metadata`` to a JSON sidecar, so the app can build its
+    sliders without loading or scanning the catalog, with the
+    ``source_fingerprint`` of ``source``, the file ``df`` was read from."""
+    with open(path, 'w') as f:
+        json.dump({'source': source_fingerprint(source) if source is not None else None,
+                   'sliders': slider_metadata(df, columns)}, f, indent=2)
+
+
+def read_slider_metadata(path, source, hashes=None):
+    """The sliders in the sidecar at ``path`` if it was written from the
+    current contents of ``source``, else None. ``hashes`` is as for
+    ``file_sha1``."""
+    try:
+        with open(path) as f:
+            sidecar = json.load(f)
+    except FileNotFoundError:
+        return None
+    if 'sliders' not in sidecar or not built_from(sidecar['source'], source, hashes):
+        return None
+    return sidecar['sliders']
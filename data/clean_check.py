@@ -0,0 +1,46 @@
+import filecmp
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+from clean_data import clean_csv
+
+# Checks that cleaning stars_data.csv in chunks, in this process or in a
+# process pool, gives exactly cleaned_data.csv, and that peak memory does not
+# grow with the input: the raw rows are repeated up to each size and cleaned
+# with the same chunk size. Run from data/:
+#     python clean_check.py [repeats ...]
+
+repeats = [int(arg) for arg in sys.argv[1:]] or [4, 16, 48]
+chunksize = 5_000
+
+with tempfile.TemporaryDirectory() as tmp:
+    tmp = Path(tmp)
+    target = tmp / 'cleaned_data.csv'
+    for size, workers in [(10**6, 0), (chunksize, 0), (333, 0), (333, 3)]:
+        summary = clean_csv('stars_data.csv', target, size, workers)
+        assert filecmp.cmp(target, 'cleaned_data.csv', shallow=False), (size, workers)
+    print(summary.to_string(float_format='{:.3f}'.format))
+    print("Chunked and parallel cleaning match cleaned_data.csv.")
+
+    raw = pd.read_csv('stars_data.csv', dtype=str, keep_default_na=False)
+    print(f"{'raw rows':>10} {'peak MiB':>9} {'rows/s':>10}")
+    peaks = []
+    for repeat in repeats:
+        source = tmp / f'stars_{repeat}.csv'
+        pd.concat([raw] * repeat).to_csv(source, index=False)
+        summary = clean_csv(source, target, chunksize)
+        # Tracing slows cleaning down a lot; time an untraced run.
+        tracemalloc.start()
+        clean_csv(source, target, chunksize)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        peaks.append(peak)
+        print(f"{len(raw) * repeat:>10,} {peak / 2**20:>9.1f} "
+              f"{len(raw) * repeat / summary['seconds'].sum():>10,.0f}")
+    # Chunks of pandas garbage are freed whenever the cycle collector runs,
+    # so the peak wobbles a little, but it must not follow the input size.
+    assert max(peaks) < 2 * min(peaks), "peak memory grows with the input"
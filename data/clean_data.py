@@ -1,57 +1,145 @@
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
 import pandas as pd
-import numpy as np
-
-data = pd.read_csv('stars_data.csv')
-print(data.isnull().sum())
-
-
-def parse_right_ascension(ra):
-    try:
-        units = ra.replace('h', '').replace('m', '').replace('s', '').split()
-        if len(units) == 3:
-            hours, minutes, seconds = map(float, units)
-            return hours + minutes/60 + seconds/3600
-    except:
-        return np.nan
-
-
-def parse_declination(dec):
-    if isinstance(dec, float):
-        return dec
-    try:
-        dec = dec.strip().replace('\u2212', '-')
-        dec = dec.replace('°', ' ').replace('′', ' ').replace(
-            '″', ' ').replace('+', ' ').strip()
-        sign = -1 if '-' in dec else 1
-        dec = dec.replace('-', ' ').strip()
-
-        units = dec.split()
-        if len(units) == 3:
-            degrees, minutes, seconds = map(float, units)
-            return sign * (degrees + minutes / 60 + seconds / 3600)
-    except Exception as e:
-        print(f"Error parsing declination: {dec} - {str(e)}")
-        return np.nan
-
-
-data['apparent_magnitude'] = data['apparent_magnitude'].astype(
-    str).replace(u'\u2212', '-', regex=True)
-data['absolute_magnitude'] = data['absolute_magnitude'].astype(
-    str).replace(u'\u2212', '-', regex=True)
-data['declination'] = data['declination'].apply(parse_declination)
-data['right_ascension'] = data['right_ascension'].apply(parse_right_ascension)
-
-data['right_ascension'] = pd.to_numeric(
-    data['right_ascension'], errors='coerce')
-data['declination'] = pd.to_numeric(data['declination'], errors='coerce')
-data['apparent_magnitude'] = pd.to_numeric(
-    data['apparent_magnitude'], errors='coerce')
-data['absolute_magnitude'] = pd.to_numeric(
-    data['absolute_magnitude'], errors='coerce')
-data['distance_light_year'] = pd.to_numeric(
-    data['distance_light_year'], errors='coerce')
-data = data.dropna(subset=['apparent_magnitude',
-                   'absolute_magnitude', 'distance_light_year', 'spectral_class'])
-print(data.isnull().sum())
-
-data.to_csv('cleaned_data.csv', index=False)
+from parsing import parse_declinations, parse_magnitudes, parse_right_ascensions
+from catalog import write_catalog, load_catalog, write_slider_metadata
+from schema import compact_catalog, check_round_trip, memory_report
+
+# Rows missing any of these are dropped.
+REQUIRED_COLUMNS = ['apparent_magnitude', 'absolute_magnitude', 'distance_light_year',
+                    'spectral_class']
+STAGES = ['read', 'parse', 'coerce', 'dropna', 'write']
+
+
+def parse_stage(data):
+    data['apparent_magnitude'] = parse_magnitudes(data['apparent_magnitude'])
+    data['absolute_magnitude'] = parse_magnitudes(data['absolute_magnitude'])
+    data['declination'] = parse_declinations(data['declination'])
+    data['right_ascension'] = parse_right_ascensions(data['right_ascension'])
+    return data
+
+
+def coerce_stage(data):
+    # Always float, even when a chunk happens to hold only whole numbers, so
+    # every chunk is written the same way.
+    data['distance_light_year'] = pd.to_numeric(
+        data['distance_light_year'], errors='coerce').astype('float64')
+    for column in ['right_ascension', 'declination', 'apparent_magnitude',
+                   'absolute_magnitude']:
+        data[column] = data[column].astype('float64')
+    return data
+
+
+def dropna_stage(data):
+    return data.dropna(subset=REQUIRED_COLUMNS)
+
+
+def clean_chunk(data):
+    """Run the parse, coerce and dropna stages over one chunk of raw rows.
+    Returns the cleaned chunk and ``{stage: (rows in, rows out, seconds)}``."""
+    stats = {}
+    for stage, run in [('parse', parse_stage), ('coerce', coerce_stage),
+                       ('dropna', dropna_stage)]:
+        rows = len(data)
+        start = time.perf_counter()
+        data = run(data)
+        stats[stage] = (rows, len(data), time.perf_counter() - start)
+    return data, stats
+
+
+def _read_chunks(source, chunksize, stats):
+    # Every column is read as text, so no chunk's dtypes depend on what the
+    # other chunks hold.
+    chunks = pd.read_csv(source, dtype=str, chunksize=chunksize)
+    while True:
+        start = time.perf_counter()
+        chunk = next(chunks, None)
+        if chunk is None:
+            return
+        _add(stats, 'read', (len(chunk), len(chunk), time.perf_counter() - start))
+        yield chunk
+
+
+def _add(stats, stage, counts):
+    stats[stage] = [total + count for total, count in zip(stats[stage], counts)]
+
+
+def clean_csv(source='stars_data.csv', target='cleaned_data.csv', chunksize=50_000,
+              workers=0):
+    """Clean the raw catalog at ``source`` into ``target`` ``chunksize``
+    rows at a time, so memory stays bounded however large the input is.
+
+    With ``workers`` > 0 the chunks are cleaned in a process pool, at most
+    two per worker in flight; they are still written in input order. The
+    output is written next to ``target`` and moved into place when
+    complete. Returns a summary frame of rows in, rows dropped and seconds
+    per stage; with workers the stage times add up across processes.
+    """
+    stats = {stage: [0, 0, 0.0] for stage in STAGES}
+    partial = Path(target).with_suffix('.part')
+    with open(partial, 'w', encoding='utf-8', newline='') as f:
+        header = True
+
+        def write(cleaned, chunk_stats):
+            nonlocal header
+            for stage, counts in chunk_stats.items():
+                _add(stats, stage, counts)
+            start = time.perf_counter()
+            cleaned.to_csv(f, header=header, index=False)
+            header = False
+            _add(stats, 'write', (len(cleaned), len(cleaned), time.perf_counter() - start))
+
+        chunks = _read_chunks(source, chunksize, stats)
+        if workers:
+            with ProcessPoolExecutor(workers) as pool:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.submit(clean_chunk, chunk))
+                    if len(pending) >= 2 * workers:
+                        write(*pending.popleft().result())
+                while pending:
+                    write(*pending.popleft().result())
+        else:
+            for chunk in chunks:
+                write(*clean_chunk(chunk))
+        if header:
+            # Nothing was read; still write the header line.
+            pd.read_csv(source, nrows=0).to_csv(f, index=False)
+    os.replace(partial, target)
+
+    summary = pd.DataFrame(stats, index=['rows_in', 'rows_out', 'seconds']).T
+    summary['rows_dropped'] = summary['rows_in'] - summary['rows_out']
+    summary[['rows_in', 'rows_dropped']] = summary[['rows_in', 'rows_dropped']].astype(int)
+    return summary[['rows_in', 'rows_dropped', 'seconds']]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Clean the raw star catalog.")
+    parser.add_argument('--input', default='stars_data.csv')
+    parser.add_argument('--output', default='cleaned_data.csv')
+    parser.add_argument('--chunksize', type=int, default=50_000, help="rows per chunk")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="processes cleaning chunks in parallel; 0 cleans in this process")
+    parser.add_argument('--catalog', action='store_true',
+                        help="also write the binary catalog and slider_metadata.json next to "
+                             "--output; this reads the whole cleaned catalog into memory")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summary = clean_csv(args.input, args.output, args.chunksize, args.workers)
+    print(summary.to_string(float_format='{:.3f}'.format))
+    print(f"Cleaned in {time.perf_counter() - start:.2f} s")
+
+    if args.catalog:
+        output = Path(args.output)
+        cleaned = pd.read_csv(output)
+        compact = compact_catalog(cleaned)
+        write_catalog(compact, output.with_name('catalog'), source=output)
+        write_slider_metadata(cleaned, output.with_name('slider_metadata.json'), source=output)
+        print(check_round_trip(cleaned, load_catalog(output.with_name('catalog'))[0]))
+        print(memory_report(compact, baseline=cleaned))
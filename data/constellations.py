@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+STAT_COLUMNS = [
+    'right_ascension',
+    'declination',
+    'apparent_magnitude',
+    'absolute_magnitude',
+    'distance_light_year',
+]
+
+
+def partition_by_constellation(df):
+    """Split the catalog into one frame per constellation, keeping catalog
+    row order inside each frame."""
+    return {constellation: group
+            for constellation, group in df.groupby('constellation', sort=False, observed=True)}
+
+
+def constellation_positions(df):
+    """Row positions of every constellation's stars, in catalog order,
+    keyed by constellation in order of first appearance.
+
+    ``df.iloc[positions]`` is the constellation's frame; the positions take
+    a few bytes per star where frames would copy every column, and leave a
+    memory-mapped catalog shared between processes.
+    """
+    codes, constellations = pd.factorize(df['constellation'], sort=False)
+    order = np.argsort(codes, kind='stable')
+    order = order.astype(np.int32 if len(df) < 2 ** 31 else np.int64)
+    counts = np.bincount(codes[codes >= 0], minlength=len(constellations))
+    groups = np.split(order[np.count_nonzero(codes < 0):], np.cumsum(counts)[:-1])
+    return dict(zip(list(constellations), groups))
+
+
+def constellation_stats(df, columns=STAT_COLUMNS):
+    """Mean, min, max and count of every attribute in ``columns`` per
+    constellation, with ``(column, statistic)`` column labels. Statistics
+    are computed in float64 whatever the stored dtype."""
+    values = df[columns].astype(np.float64)
+    return values.groupby(df['constellation'], observed=True).agg(['mean', 'min', 'max', 'count'])
@@ -0,0 +1,124 @@
+import asyncio
+import filecmp
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from obtain_data import StarFetcher, constellations, merge_pages, read_store, save_data
+from stub_server import StubStarsAPI, load_stars
+
+# Downloads stars_data.csv again from a local stub of the stars API that is
+# slow and fails a share of requests, and checks that the rebuilt CSV is
+# identical to the original. Then checks incremental sync: an unchanged
+# rerun only probes, changed stars are upserted, a probe misses an edit
+# past the first page that a full run picks up, and an interrupted run
+# resumes where it stopped. Run from data/:
+#     python fetch_check.py [failure_rate]
+
+failure_rate = float(sys.argv[1]) if len(sys.argv) > 1 else 0.2
+server = StubStarsAPI(load_stars(), failure_rate=failure_rate, latency=0.02).start()
+total_stars = sum(map(len, server.pages.values()))
+
+
+def fetch(pages, retries=10, verify='probe'):
+    fetcher = StarFetcher('test-key', pages, url=server.url, concurrency=8, rate=200,
+                          retries=retries, backoff=0.01)
+    requests_before = server.requests
+    start = time.perf_counter()
+    statuses = asyncio.run(fetcher.run(constellations, verify))
+    elapsed = time.perf_counter() - start
+    assert fetcher.stats['requests'] == server.requests - requests_before
+    return fetcher, statuses, elapsed
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    tmp = Path(tmp)
+    pages = tmp / 'pages'
+    store = tmp / 'stars_data.csv'
+
+    # Full download.
+    fetcher, statuses, elapsed = fetch(pages)
+    print(f"Download: {fetcher.stats} in {elapsed:.1f} s; "
+          f"{server.failures} requests failed on purpose")
+    assert set(statuses.values()) == {'fetched'}
+    assert fetcher.stats['stars'] == total_stars
+    save_data(pages, constellations, store)
+    assert filecmp.cmp(store, 'stars_data.csv', shallow=False), \
+        "rebuilt stars_data.csv differs from the original"
+    print("Rebuilt stars_data.csv matches the original.")
+
+    # Merging into the existing CSV changes nothing.
+    stats = merge_pages(pages, constellations, store)
+    assert stats == {'merged': len(constellations), 'inserted': 0, 'updated': 0}, stats
+    assert filecmp.cmp(store, 'stars_data.csv', shallow=False)
+
+    # An unchanged rerun costs two requests per constellation.
+    server.failure_rate = 0
+    fetcher, statuses, elapsed = fetch(pages)
+    print(f"Unchanged sync: {fetcher.stats} in {elapsed:.1f} s")
+    assert set(statuses.values()) == {'unchanged'}
+    assert fetcher.stats['requests'] == 2 * len(constellations)
+    assert merge_pages(pages, constellations, store) == {'merged': 0, 'inserted': 0, 'updated': 0}
+
+    # One star edited, one added: only those two constellations are fetched
+    # and merged.
+    edited = dict(server.pages['Orion'][0], apparent_magnitude='0.99')
+    server.pages['Orion'][0] = edited
+    added = dict(server.pages['Lyra'][0], name='Test Lyr', right_ascension='18h 00m 00.00s')
+    server.pages['Lyra'].append(added)
+    fetcher, statuses, elapsed = fetch(pages)
+    print(f"Changed sync: {fetcher.stats} in {elapsed:.1f} s")
+    assert statuses['Orion'] == statuses['Lyra'] == 'fetched'
+    assert sum(status == 'unchanged' for status in statuses.values()) == len(constellations) - 2
+    stats = merge_pages(pages, constellations, store)
+    assert stats == {'merged': 2, 'inserted': 1, 'updated': 1}, stats
+    expected = load_stars()
+    expected.loc[expected['name'].eq(edited['name']) &
+                 expected['constellation'].eq('Orion'), 'apparent_magnitude'] = '0.99'
+    lyra_end = expected.index[expected['constellation'] == 'Lyra'][-1]
+    expected = pd.concat([expected.loc[:lyra_end], pd.DataFrame([added]),
+                          expected.loc[lyra_end + 1:]], ignore_index=True)
+    pd.testing.assert_frame_equal(read_store(store), expected)
+
+    # An edit past the first page: probing reports it unchanged, a full
+    # run fetches and merges it.
+    row = server.page_size + 1
+    edited = dict(server.pages['Orion'][row], apparent_magnitude='4.44')
+    server.pages['Orion'][row] = edited
+    fetcher, statuses, elapsed = fetch(pages)
+    assert statuses['Orion'] == 'unchanged'
+    assert merge_pages(pages, constellations, store)['updated'] == 0
+    fetcher, statuses, elapsed = fetch(pages, verify='full')
+    print(f"Full sync: {fetcher.stats} in {elapsed:.1f} s")
+    assert set(statuses.values()) == {'fetched'}
+    # Only the constellation whose pages changed is merged again.
+    stats = merge_pages(pages, constellations, store)
+    assert stats == {'merged': 1, 'inserted': 0, 'updated': 1}, stats
+    expected.loc[expected['name'].eq(edited['name']) &
+                 expected['constellation'].eq('Orion'), 'apparent_magnitude'] = '4.44'
+    pd.testing.assert_frame_equal(read_store(store), expected)
+
+    # A run that dies part-way resumes from its checkpoints.
+    shutil.rmtree(pages)
+    server.failure_rate = 0.3
+    fetcher, statuses, elapsed = fetch(pages, retries=1)
+    failed = [name for name, status in statuses.items() if isinstance(status, Exception)]
+    print(f"Interrupted download: {len(failed)} constellations failed, {fetcher.stats['pages']} "
+          f"pages saved")
+    assert failed
+    server.failure_rate = 0
+    fetcher, statuses, elapsed = fetch(pages)
+    print(f"Resumed: {fetcher.stats} in {elapsed:.1f} s, "
+          f"{pd.Series(list(statuses.values())).value_counts().to_dict()}")
+    assert fetcher.stats['requests'] < 2 * len(constellations) + sum(
+        len(stars) // server.page_size + 1 for stars in server.pages.values())
+    assert merge_pages(pages, constellations, store) == \
+        {'merged': len(constellations), 'inserted': 0, 'updated': 0}
+    pd.testing.assert_frame_equal(read_store(store), expected)
+    print("Sync checks passed.")
+
+server.shutdown()
@@ -1,49 +1,356 @@
-import requests
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from tenacity import (AsyncRetrying, retry_if_exception, stop_after_attempt,
+                      wait_exponential_jitter)
+
+API_URL = 'https://api.api-ninjas.com/v1/stars'
+
+# Fields of a star record, in stars_data.csv column order.
+STAR_COLUMNS = [
+    'name', 'constellation', 'right_ascension', 'declination', 'apparent_magnitude',
+    'absolute_magnitude', 'distance_light_year', 'spectral_class',
+]
 
 constellations = [
-    "Andromeda", "Antlia", "Apus", "Aquarius", "Aquila", "Ara", "Aries", "Auriga", 
-    "Boötes", "Caelum", "Camelopardalis", "Cancer", "Canes Venatici", "Canis Major", 
-    "Canis Minor", "Capricornus", "Carina", "Cassiopeia", "Centaurus", "Cepheus", 
-    "Cetus", "Chamaeleon", "Circinus", "Columba", "Coma Berenices", "Corona Australis", 
-    "Corona Borealis", "Corvus", "Crater", "Crux", "Cygnus", "Delphinus", "Dorado", 
-    "Draco", "Equuleus", "Eridanus", "Fornax", "Gemini", "Grus", "Hercules", 
-    "Horologium", "Hydra", "Hydrus", "Indus", "Lacerta", "Leo", "Leo Minor", "Lepus", 
-    "Libra", "Lupus", "Lynx", "Lyra", "Mensa", "Microscopium", "Monoceros", "Musca", 
-    "Norma", "Octans", "Ophiuchus", "Orion", "Pavo", "Pegasus", "Perseus", "Phoenix", 
-    "Pictor", "Pisces", "Piscis Austrinus", "Puppis", "Pyxis", "Reticulum", "Sagitta", 
-    "Sagittarius", "Scorpius", "Sculptor", "Scutum", "Serpens", "Sextans", "Taurus", 
-    "Telescopium", "Triangulum", "Triangulum Australe", "Tucana", "Ursa Major", "Ursa Minor", 
+    "Andromeda", "Antlia", "Apus", "Aquarius", "Aquila", "Ara", "Aries", "Auriga",
+    "Boötes", "Caelum", "Camelopardalis", "Cancer", "Canes Venatici", "Canis Major",
+    "Canis Minor", "Capricornus", "Carina", "Cassiopeia", "Centaurus", "Cepheus",
+    "Cetus", "Chamaeleon", "Circinus", "Columba", "Coma Berenices", "Corona Australis",
+    "Corona Borealis", "Corvus", "Crater", "Crux", "Cygnus", "Delphinus", "Dorado",
+    "Draco", "Equuleus", "Eridanus", "Fornax", "Gemini", "Grus", "Hercules",
+    "Horologium", "Hydra", "Hydrus", "Indus", "Lacerta", "Leo", "Leo Minor", "Lepus",
+    "Libra", "Lupus", "Lynx", "Lyra", "Mensa", "Microscopium", "Monoceros", "Musca",
+    "Norma", "Octans", "Ophiuchus", "Orion", "Pavo", "Pegasus", "Perseus", "Phoenix",
+    "Pictor", "Pisces", "Piscis Austrinus", "Puppis", "Pyxis", "Reticulum", "Sagitta",
+    "Sagittarius", "Scorpius", "Sculptor", "Scutum", "Serpens", "Sextans", "Taurus",
+    "Telescopium", "Triangulum", "Triangulum Australe", "Tucana", "Ursa Major", "Ursa Minor",
     "Vela", "Virgo", "Volans", "Vulpecula"
 ]
 
-def fetch_stars(api_key, constellation):
-    base_url = 'https://api.api-ninjas.com/v1/stars'
-    results = []
-    offset = 0
-    while True:
-        params = {
+
+class RateLimiter:
+    """Token bucket shared by every request: at most ``rate`` requests per
+    second, in bursts of up to ``burst``."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def _retryable(error):
+    """Connection problems, timeouts, 429 and 5xx responses are retried;
+    other client errors are not."""
+    if isinstance(error, requests.HTTPError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout,
+                              requests.JSONDecodeError))
+
+
+class StarFetcher:
+    """Downloads the stars API into one JSON file per page.
+
+    Constellations are fetched concurrently, ``concurrency`` at a time, over
+    one pooled ``requests.Session`` driven from a thread pool. Every request
+    waits for the shared ``RateLimiter`` and failed requests are retried
+    with exponential backoff. A constellation is paged by the number of
+    stars each page actually returned until a page comes back empty, and
+    every page is written to ``<out_dir>/<constellation>/<offset>.json`` as
+    soon as it arrives.
+
+    Next to the pages, ``checkpoint.json`` records the next offset, a hash
+    of every page and, once the last page is in, a hash of the whole
+    constellation. An interrupted constellation resumes from its next
+    offset. A finished one is re-downloaded whole (``verify='full'``), or,
+    with ``verify='probe'``, only probed: its first page is fetched again
+    and compared, and the page after its last star must still be empty.
+    Probing costs two requests per constellation but only notices stars
+    added at the end and edits on the first page; an edit on any later
+    page goes unnoticed until a full run.
+    """
+
+    def __init__(self, api_key, out_dir, url=API_URL, concurrency=8, rate=10.0,
+                 retries=5, backoff=0.5, timeout=30):
+        self.api_key = api_key
+        self.out_dir = Path(out_dir)
+        self.url = url
+        self.concurrency = concurrency
+        self.rate = rate
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.stats = {'requests': 0, 'retries': 0, 'pages': 0, 'stars': 0}
+
+        self.session = requests.Session()
+        self.session.headers['X-Api-Key'] = api_key
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _get(self, constellation, offset):
+        response = self.session.get(self.url, timeout=self.timeout, params={
             'constellation': constellation,
-            'offset': offset
-        }
-        headers = {'X-Api-Key': api_key}
-        response = requests.get(base_url, headers=headers, params=params)
-        data = response.json()
-        if not data:
-            break
-        results.extend(data)
-        offset += 30
-    return results
-
-def save_data(stars_data):
-    df = pd.DataFrame(stars_data)
-    df.to_csv('stars_data.csv', mode='a', header=False)  
-
-api_key = 'PewrA/MGCHxgJ7ncmaC0Tw==2xzQLCjmoMvC6alK' # will be removed after project submission
-all_stars = []
-for constellation in constellations:
-    stars_data = fetch_stars(api_key, constellation)
-    save_data(stars_data)
-    all_stars.extend(stars_data)  
-
-print("All star data collected and saved.")
+            'offset': offset,
+        })
+        response.raise_for_status()
+        return response.json()
+
+    def _count_retry(self, state):
+        self.stats['retries'] += 1
+
+    async def fetch_page(self, constellation, offset):
+        loop = asyncio.get_running_loop()
+        async for attempt in AsyncRetrying(
+                stop=stop_after_attempt(self.retries),
+                wait=wait_exponential_jitter(initial=self.backoff, max=30, jitter=self.backoff),
+                retry=retry_if_exception(_retryable),
+                before_sleep=self._count_retry,
+                reraise=True):
+            with attempt:
+                await self.limiter.acquire()
+                self.stats['requests'] += 1
+                return await loop.run_in_executor(self.executor, self._get,
+                                                  constellation, offset)
+
+    def write_page(self, constellation, offset, stars):
+        directory = self.out_dir / constellation
+        directory.mkdir(parents=True, exist_ok=True)
+        _write_json(directory / f'{offset:06d}.json', stars)
+
+    async def _unchanged(self, constellation, checkpoint):
+        first = await self.fetch_page(constellation, 0)
+        if page_hash(first) != checkpoint['pages'].get('0', page_hash([])):
+            return False
+        return not await self.fetch_page(constellation, checkpoint['offset'])
+
+    async def fetch_constellation(self, constellation, verify='full'):
+        """Bring one constellation's pages up to date and return
+        ``'unchanged'``, ``'resumed'`` or ``'fetched'``."""
+        async with self.semaphore:
+            checkpoint = read_checkpoint(self.out_dir, constellation)
+            status = 'resumed'
+            if checkpoint['complete']:
+                if verify == 'probe' and await self._unchanged(constellation, checkpoint):
+                    return 'unchanged'
+                for path in (self.out_dir / constellation).glob('*.json'):
+                    path.unlink()
+                checkpoint.update(complete=False, offset=0, pages={}, hash=None)
+                status = 'fetched'
+            elif not checkpoint['pages']:
+                status = 'fetched'
+
+            offset = checkpoint['offset']
+            while True:
+                stars = await self.fetch_page(constellation, offset)
+                if not stars:
+                    break
+                self.write_page(constellation, offset, stars)
+                self.stats['pages'] += 1
+                self.stats['stars'] += len(stars)
+                checkpoint['pages'][str(offset)] = page_hash(stars)
+                offset += len(stars)
+                checkpoint['offset'] = offset
+                write_checkpoint(self.out_dir, constellation, checkpoint)
+
+            checkpoint['complete'] = True
+            checkpoint['hash'] = page_hash(list(checkpoint['pages'].values()))
+            write_checkpoint(self.out_dir, constellation, checkpoint)
+            return status
+
+    async def run(self, names, verify='full'):
+        """Fetch every constellation in ``names`` and return ``{name:
+        status}``. A constellation that still fails after its retries gets
+        its exception as status; the others are unaffected and it resumes
+        on the next run."""
+        self.limiter = RateLimiter(self.rate, burst=self.concurrency)
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as self.executor:
+            statuses = await asyncio.gather(
+                *(self.fetch_constellation(name, verify) for name in names),
+                return_exceptions=True)
+        return dict(zip(names, statuses))
+
+
+def page_hash(stars):
+    return hashlib.sha1(json.dumps(stars, sort_keys=True, ensure_ascii=False)
+                        .encode('utf-8')).hexdigest()
+
+
+def _write_json(path, value):
+    partial = path.with_suffix('.part')
+    with open(partial, 'w', encoding='utf-8') as f:
+        json.dump(value, f, ensure_ascii=False)
+    os.replace(partial, path)
+
+
+def read_checkpoint(out_dir, constellation):
+    path = Path(out_dir) / constellation / 'checkpoint.json'
+    if not path.exists():
+        return {'complete': False, 'offset': 0, 'pages': {}, 'hash': None, 'merged': None}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_checkpoint(out_dir, constellation, checkpoint):
+    directory = Path(out_dir) / constellation
+    directory.mkdir(parents=True, exist_ok=True)
+    _write_json(directory / 'checkpoint.json', checkpoint)
+
+
+def read_pages(out_dir, constellation):
+    """All stars of one constellation from its page files, in API order."""
+    stars = []
+    paths = (Path(out_dir) / constellation).glob('[0-9]*.json')
+    for path in sorted(paths, key=lambda path: int(path.stem)):
+        with open(path, encoding='utf-8') as f:
+            stars.extend(json.load(f))
+    return stars
+
+
+def _star_keys(frame):
+    # Stars are keyed on (name, constellation); the few names the API lists
+    # twice in one constellation (double stars) are told apart by order.
+    return pd.MultiIndex.from_arrays(
+        [frame['name'], frame['constellation'], frame.groupby('name').cumcount()])
+
+
+def upsert(existing, stars):
+    """Merge freshly downloaded ``stars`` of one constellation into its
+    ``existing`` rows. Changed stars are updated in place, new stars are
+    appended in API order and stars no longer listed are kept. Returns the
+    merged frame and the number of inserted and updated stars."""
+    fresh = pd.DataFrame(stars, columns=STAR_COLUMNS).fillna('').astype(str)
+    fresh.index = _star_keys(fresh)
+    existing = existing.copy()
+    existing.index = _star_keys(existing)
+
+    common = fresh.index.intersection(existing.index, sort=False)
+    changed = (fresh.loc[common] != existing.loc[common]).any(axis=1)
+    changed = changed[changed].index
+    existing.loc[changed] = fresh.loc[changed]
+    inserted = fresh.loc[fresh.index.difference(existing.index, sort=False)]
+    merged = pd.concat([existing, inserted]).reset_index(drop=True)
+    return merged, len(inserted), len(changed)
+
+
+def read_store(path):
+    if not Path(path).exists():
+        return pd.DataFrame(columns=STAR_COLUMNS)
+    return pd.read_csv(path, dtype=str, keep_default_na=False).drop(columns='index')
+
+
+def write_store(frames, path):
+    """Write ``{constellation: frame}`` as stars_data.csv, constellation by
+    constellation in dict order, numbering the stars of each from 0."""
+    partial = Path(path).with_suffix('.part')
+    with open(partial, 'w', encoding='utf-8', newline='') as f:
+        f.write(','.join(['index'] + STAR_COLUMNS) + '\n')
+        for frame in frames.values():
+            if len(frame):
+                frame[STAR_COLUMNS].reset_index(drop=True).to_csv(f, header=False)
+    os.replace(partial, path)
+
+
+def save_data(out_dir, names, path='stars_data.csv'):
+    """Write the downloaded pages to one CSV, constellation by constellation
+    in ``names`` order, numbering the stars of each from 0."""
+    write_store({constellation: pd.DataFrame(read_pages(out_dir, constellation),
+                                             columns=STAR_COLUMNS)
+                 for constellation in names}, path)
+
+
+def merge_pages(out_dir, names, path='stars_data.csv'):
+    """Upsert every constellation whose downloaded pages changed since they
+    were last merged into the CSV at ``path``. Returns ``{'merged',
+    'inserted', 'updated'}`` counts; the CSV is only rewritten if a star
+    was inserted or updated."""
+    store = read_store(path)
+    frames = {constellation: group.reset_index(drop=True)
+              for constellation, group in store.groupby('constellation', sort=False)}
+    ordered = {name: frames.pop(name, pd.DataFrame(columns=STAR_COLUMNS)) for name in names}
+    ordered.update(frames)
+
+    stats = {'merged': 0, 'inserted': 0, 'updated': 0}
+    done = []
+    for constellation in names:
+        checkpoint = read_checkpoint(out_dir, constellation)
+        if not checkpoint['complete'] or checkpoint['hash'] == checkpoint.get('merged'):
+            continue
+        ordered[constellation], inserted, updated = upsert(
+            ordered[constellation], read_pages(out_dir, constellation))
+        stats['merged'] += 1
+        stats['inserted'] += inserted
+        stats['updated'] += updated
+        done.append((constellation, checkpoint))
+
+    if stats['inserted'] or stats['updated'] or not Path(path).exists():
+        write_store(ordered, path)
+    # Only mark constellations merged once the CSV holds them; an upsert
+    # that is repeated after a crash changes nothing.
+    for constellation, checkpoint in done:
+        checkpoint['merged'] = checkpoint['hash']
+        write_checkpoint(out_dir, constellation, checkpoint)
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Download the star catalog from the stars API.")
+    parser.add_argument('--url', default=API_URL)
+    parser.add_argument('--pages', default='pages', help="directory for the downloaded pages")
+    parser.add_argument('--output', default='stars_data.csv')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=10.0, help="requests per second")
+    parser.add_argument('--retries', type=int, default=5)
+    parser.add_argument('--verify', choices=['probe', 'full'], default='full',
+                        help="how to check constellations that were already downloaded: "
+                             "'full' downloads them again; 'probe' only refetches their first "
+                             "page and the page after their last star, so it notices added "
+                             "stars and first-page edits but misses edits on later pages")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="rewrite the CSV from the pages instead of merging into it")
+    args = parser.parse_args()
+
+    api_key = os.environ.get('API_NINJAS_KEY', 'PewrA/MGCHxgJ7ncmaC0Tw==2xzQLCjmoMvC6alK') # will be removed after project submission
+    fetcher = StarFetcher(api_key, args.pages, url=args.url, concurrency=args.concurrency,
+                          rate=args.rate, retries=args.retries)
+    start = time.perf_counter()
+    statuses = asyncio.run(fetcher.run(constellations, verify=args.verify))
+    if args.rebuild:
+        save_data(args.pages, constellations, args.output)
+    else:
+        print(merge_pages(args.pages, constellations, args.output))
+    print(f"{fetcher.stats} in {time.perf_counter() - start:.1f} s")
+
+    failed = {name: status for name, status in statuses.items() if isinstance(status, Exception)}
+    summary = pd.Series([status for status in statuses.values()
+                         if not isinstance(status, Exception)]).value_counts()
+    print(summary.to_dict())
+    if failed:
+        for name, error in failed.items():
+            print(f"{name}: {error!r}")
+        raise SystemExit(f"{len(failed)} constellation(s) failed; run again to resume them.")
+    print("All star data collected and saved.")
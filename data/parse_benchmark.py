@@ -0,0 +1,45 @@
+import contextlib
+import io
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from parsing import (parse_declination, parse_declinations, parse_right_ascension,
+                     parse_right_ascensions)
+
+# Times the row-by-row RA/Dec parsers against the vectorized ones on the
+# stars_data.csv coordinates repeated up to each size, and checks that both
+# give bit-identical results. Run from data/:
+#     python parse_benchmark.py [rows ...]
+
+sizes = [int(arg) for arg in sys.argv[1:]] or [len(pd.read_csv('stars_data.csv')), 100_000, 1_000_000]
+raw = pd.read_csv('stars_data.csv')
+
+
+def rowwise(values, parse):
+    # parse_declination prints the values it cannot parse; keep that out of
+    # the timings' output.
+    with contextlib.redirect_stdout(io.StringIO()):
+        return pd.to_numeric(values.apply(parse), errors='coerce')
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+print(f"{'column':<16} {'rows':>10} {'apply rows/s':>14} {'vectorized rows/s':>18} {'speed-up':>9}")
+for size in sizes:
+    rows = np.resize(np.arange(len(raw)), size)
+    for column, parse, vectorized in [
+            ('right_ascension', parse_right_ascension, parse_right_ascensions),
+            ('declination', parse_declination, parse_declinations)]:
+        values = raw[column].iloc[rows].reset_index(drop=True)
+        expected, slow = timed(rowwise, values, parse)
+        actual, fast = timed(vectorized, values)
+        assert np.array_equal(expected.to_numpy(), actual.to_numpy(), equal_nan=True), column
+        print(f"{column:<16} {size:>10,} {size / slow:>14,.0f} {size / fast:>18,.0f} "
+              f"{slow / fast:>8.1f}x")
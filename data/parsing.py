@@ -0,0 +1,173 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# One sexagesimal component: digits with an optional fractional part.
+_NUMBER = r'([0-9]+(?:\.[0-9]*)?)'
+
+# "00h 08m 23.17s", with the unit letters optional.
+_RA_PATTERN = rf'^\s*{_NUMBER}h?\s+{_NUMBER}m?\s+{_NUMBER}s?\s*$'
+
+# "+29° 05′ 27.0″" or "−75 21 31.25", with an ASCII or Unicode minus.
+_DEC_PATTERN = (rf'^\s*([+\-\u2212]?)\s*{_NUMBER}(?:\s*°\s*|\s+){_NUMBER}'
+                rf'(?:\s*′\s*|\s+){_NUMBER}\s*″?\s*$')
+
+
+def parse_right_ascension(ra):
+    try:
+        units = ra.replace('h', '').replace('m', '').replace('s', '').split()
+        if len(units) == 3:
+            hours, minutes, seconds = map(float, units)
+            return hours + minutes/60 + seconds/3600
+    except:
+        return np.nan
+
+
+def parse_declination(dec):
+    if isinstance(dec, float):
+        return dec
+    try:
+        dec = dec.strip().replace('\u2212', '-')
+        dec = dec.replace('°', ' ').replace('′', ' ').replace(
+            '″', ' ').replace('+', ' ').strip()
+        sign = -1 if '-' in dec else 1
+        dec = dec.replace('-', ' ').strip()
+
+        units = dec.split()
+        if len(units) == 3:
+            degrees, minutes, seconds = map(float, units)
+            return sign * (degrees + minutes / 60 + seconds / 3600)
+    except Exception as e:
+        print(f"Error parsing declination: {dec} - {str(e)}")
+        return np.nan
+
+
+def _components(values, pattern, max_shapes=64, max_length=40):
+    """Parse the numbers captured by ``pattern`` from every string in
+    ``values`` without a Python-level loop over the rows.
+
+    The strings are laid out as a character matrix and grouped by shape,
+    i.e. the string with every digit replaced by 9. ``pattern`` is matched
+    once per shape, which gives the position of every number (and the
+    characters of every other group) for all rows of that shape; the
+    numbers are then assembled digit by digit from the matrix columns.
+    Dividing the exact integer of a number's digits by its power of ten
+    rounds exactly like ``float()`` on the text.
+
+    Returns a list with, for every group of ``pattern``, an array of the
+    number (or, for groups without digits, the captured text) per row, and
+    a mask of the rows that were parsed. Rows of unusual shapes, with more
+    than 15 digits in a number, that are not strings, or longer than
+    ``max_length`` characters (no valid coordinate is; one such row would
+    widen the whole matrix) are left out.
+    """
+    objects = values.to_numpy(dtype=object)
+    groups = re.compile(pattern).groups
+    parsed = [None] * groups
+    matched = np.zeros(len(objects), dtype=bool)
+
+    if pd.api.types.infer_dtype(objects, skipna=False) == 'string':
+        lengths = np.fromiter(map(len, objects), dtype=np.int64, count=len(objects))
+    else:
+        lengths = np.fromiter((len(value) if type(value) is str else -1 for value in objects),
+                              dtype=np.int64, count=len(objects))
+    rows = np.flatnonzero((lengths >= 0) & (lengths <= max_length))
+    if not len(rows):
+        return parsed, matched
+    strings = objects[rows]
+    lengths = lengths[rows]
+    chars = strings.astype(str)
+    chars = chars.view(np.uint32).reshape(len(rows), -1)
+    pending = np.ones(len(rows), dtype=bool)
+    # NUL characters look like padding in the matrix; leave rows with any
+    # out.
+    if lengths.sum() != np.count_nonzero(chars):
+        pending = np.count_nonzero(chars, axis=1) == lengths
+    digits = chars - ord('0')
+    shapes = np.where(digits <= 9, ord('9'), chars)
+    # Compare whole rows at once as opaque byte strings.
+    keys = shapes.view(f'V{shapes.itemsize * shapes.shape[1]}').ravel()
+
+    for _ in range(max_shapes):
+        todo = np.flatnonzero(pending)
+        if not len(todo):
+            break
+        shape = shapes[todo[0]]
+        if len(todo) == len(keys):
+            same = np.flatnonzero(keys == keys[todo[0]])
+        else:
+            same = todo[keys[todo] == keys[todo[0]]]
+        pending[same] = False
+
+        match = re.match(pattern, ''.join(map(chr, shape)).rstrip('\0'))
+        if match is None:
+            continue
+        numbers = []
+        for group in range(1, groups + 1):
+            start, stop = match.span(group)
+            text = match.group(group)
+            if '9' not in text:
+                numbers.append(text)
+                continue
+            if len(text.replace('.', '')) > 15:
+                break
+            whole = np.zeros(len(same), dtype=np.int64)
+            for column in range(start, stop):
+                if shape[column] != ord('.'):
+                    whole *= 10
+                    whole += digits[same, column]
+            point = text.find('.')
+            numbers.append(whole / 10.0 ** (len(text) - point - 1 if point >= 0 else 0))
+        else:
+            for group, number in enumerate(numbers):
+                if parsed[group] is None:
+                    parsed[group] = np.full(len(objects), np.nan, dtype=object
+                                            if isinstance(number, str) else np.float64)
+                parsed[group][rows[same]] = number
+            matched[rows[same]] = True
+    return parsed, matched
+
+
+def _fallback(values, result, matched, parse):
+    """Parse the rows the fast pattern did not recognise one by one, so odd
+    spellings get exactly the answer the row-wise parser gives."""
+    rest = ~matched
+    if rest.any():
+        result[rest] = pd.to_numeric(values[rest].apply(parse), errors='coerce')
+    return pd.Series(result, index=values.index, name=values.name)
+
+
+def parse_right_ascensions(values):
+    """Vectorized ``parse_right_ascension`` over a Series, in hours.
+
+    Well-formed values are parsed by ``_components``; anything else falls
+    back to ``parse_right_ascension``. Unparseable values are NaN.
+    """
+    parts, matched = _components(values, _RA_PATTERN)
+    result = np.full(len(values), np.nan)
+    if matched.any():
+        hours, minutes, seconds = (part[matched] for part in parts)
+        result[matched] = hours + minutes/60 + seconds/3600
+    return _fallback(values, result, matched, parse_right_ascension)
+
+
+def parse_declinations(values):
+    """Vectorized ``parse_declination`` over a Series, in degrees.
+
+    Well-formed values are parsed by ``_components``; anything else falls
+    back to ``parse_declination``. Unparseable values are NaN.
+    """
+    parts, matched = _components(values, _DEC_PATTERN)
+    result = np.full(len(values), np.nan)
+    if matched.any():
+        sign = np.where(np.isin(parts[0][matched], ['-', '\u2212']), -1.0, 1.0)
+        degrees, minutes, seconds = (part[matched] for part in parts[1:])
+        result[matched] = sign * (degrees + minutes / 60 + seconds / 3600)
+    return _fallback(values, result, matched, parse_declination)
+
+
+def parse_magnitudes(values):
+    """Numbers written with a Unicode minus, NaN where not numeric."""
+    return pd.to_numeric(values.astype(str).str.replace('\u2212', '-', regex=False),
+                         errors='coerce')
@@ -0,0 +1,197 @@
+import numpy as np
+import pandas as pd
+
+# Compact dtype of every catalog column and, for numeric columns, the
+# largest error a stored value may have against the cleaned CSV: half the
+# precision of the source tables (0.01s of RA, 0.1" of Dec, 0.01 mag,
+# 0.01 ly), so every value still rounds back to what was scraped. A column
+# is only narrowed if ranges also match the same rows as on the CSV (see
+# range_mismatches); RA and Dec carry float noise that float32 rounds onto
+# nearby slider positions, so they usually stay float64. Star names are
+# nearly all distinct, where a categorical costs more than it saves, so
+# they stay strings.
+CATALOG_SCHEMA = {
+    'index': ('int32', 0),
+    'name': ('object', None),
+    'constellation': ('category', None),
+    'right_ascension': ('float32', 0.005 / 3600),
+    'declination': ('float32', 0.05 / 3600),
+    'apparent_magnitude': ('float32', 0.005),
+    'absolute_magnitude': ('float32', 0.005),
+    'distance_light_year': ('float32', 0.005),
+    'spectral_class': ('category', None),
+}
+
+
+def round_trip_error(values, dtype):
+    """Largest absolute difference between ``values`` and ``values`` stored
+    as ``dtype``, or ``inf`` if a value does not survive at all."""
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(over='ignore', invalid='ignore'):
+        stored = values.astype(dtype)
+        back = stored.astype(np.float64)
+    if np.issubdtype(np.dtype(dtype), np.integer) and np.isnan(values).any():
+        return np.inf
+    both_nan = np.isnan(values) & np.isnan(back)
+    errors = np.abs(back - values)[~both_nan]
+    if np.isnan(errors).any():
+        return np.inf
+    return float(errors.max()) if len(errors) else 0.0
+
+
+def range_mismatches(values, stored, digits=4):
+    """Bounds at which a range query on ``stored`` (``values`` in a
+    narrower dtype) matches different rows than on ``values``.
+
+    Every distinct value, and every value rounded to up to ``digits``
+    decimals (slider positions and the query cache's rounding), is probed
+    as the low and the high end of a range. A value within tolerance can
+    still land on the other side of a bound: 5.390000000000001 is above
+    5.39, but both are the same float32.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    stored = np.asarray(stored)
+    known = ~np.isnan(values)
+    values, stored = values[known], stored[known]
+    probes = np.unique(np.concatenate(
+        [values] + [np.round(values, decimals) for decimals in range(digits + 1)]))
+    with np.errstate(over='ignore', invalid='ignore'):
+        stored_probes = probes.astype(stored.dtype)
+    values, stored = np.sort(values), np.sort(stored)
+    mismatch = np.zeros(len(probes), dtype=bool)
+    for side in ['left', 'right']:
+        mismatch |= (np.searchsorted(values, probes, side)
+                     != np.searchsorted(stored, stored_probes, side))
+    return probes[mismatch]
+
+
+def compact_catalog(df, schema=CATALOG_SCHEMA):
+    """Return ``df`` with the compact dtypes from ``schema``.
+
+    Columns marked ``'category'`` become categoricals and ``'object'``
+    columns stay as they are. A numeric column is narrowed only if
+    every value stays within the schema tolerance and no
+    ``range_mismatches`` bound matches different rows; otherwise it keeps
+    its dtype. Columns missing from ``schema`` are left alone.
+    """
+    columns = {}
+    for name in df.columns:
+        values = df[name]
+        dtype, tolerance = schema.get(name, (None, None))
+        if dtype == 'category':
+            values = values.astype('category')
+        elif dtype not in (None, 'object') and round_trip_error(values, dtype) <= tolerance:
+            narrow = values.astype(dtype)
+            if not len(range_mismatches(values, narrow)):
+                values = narrow
+        columns[name] = values
+    return pd.DataFrame(columns, index=df.index)
+
+
+def check_round_trip(original, compact, schema=CATALOG_SCHEMA):
+    """Check that ``compact`` holds the same catalog as ``original`` (e.g.
+    the cleaned CSV) within the schema tolerances, and that range queries
+    on it match the same rows at every ``range_mismatches`` bound.
+
+    Returns the largest error per numeric column and raises ``ValueError``
+    if the shape, a text value, a number or a range is off.
+    """
+    if list(original.columns) != list(compact.columns) or len(original) != len(compact):
+        raise ValueError("Catalog columns or row count differ")
+
+    errors = {}
+    problems = []
+    for name in original.columns:
+        expected = original[name]
+        actual = compact[name]
+        if pd.api.types.is_numeric_dtype(expected):
+            stored = actual.to_numpy()
+            expected = expected.to_numpy(dtype=np.float64)
+            actual = actual.to_numpy(dtype=np.float64)
+            mismatch = np.isnan(expected) != np.isnan(actual)
+            error = np.abs(expected - actual)
+            errors[name] = float(np.nanmax(error)) if len(error) and \
+                not np.isnan(error).all() else 0.0
+            tolerance = schema.get(name, (None, 0))[1] or 0
+            if mismatch.any() or errors[name] > tolerance:
+                problems.append(f"{name} (max error {errors[name]:g})")
+            elif len(bounds := range_mismatches(expected, stored)):
+                problems.append(f"{name} (ranges differ at {bounds[0]!r})")
+        elif not expected.astype(object).equals(actual.astype(object)):
+            problems.append(name)
+    if problems:
+        raise ValueError(f"Round trip changed column(s): {', '.join(problems)}")
+    return errors
+
+
+def memory_report(df, baseline=None):
+    """Bytes used by every column of ``df`` (including string contents),
+    with a total row. If ``baseline`` is given, its per-column usage and
+    the saving are reported alongside."""
+    report = pd.DataFrame({
+        'dtype': df.dtypes.astype(str),
+        'bytes': df.memory_usage(index=False, deep=True),
+    })
+    if baseline is not None:
+        report.insert(0, 'baseline_dtype', baseline.dtypes.astype(str))
+        report.insert(1, 'baseline_bytes', baseline.memory_usage(index=False, deep=True))
+        report['saved'] = 1 - report['bytes'] / report['baseline_bytes']
+    total = report.select_dtypes('number').sum()
+    if baseline is not None:
+        total['saved'] = 1 - total['bytes'] / total['baseline_bytes']
+    report.loc['total'] = total
+    return report
+
+
+def value_counts(values):
+    """``values.value_counts()`` computed on integer codes.
+
+    For a categorical the counts come from a ``bincount`` of the codes
+    instead of hashing every string. The result matches ``value_counts`` on
+    the same values as plain strings: unseen categories are dropped, ties
+    keep first-appearance order and the index holds plain strings.
+    """
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        return values.value_counts()
+
+    codes = values.cat.codes.to_numpy()
+    codes = codes[codes >= 0]
+    seen, first = np.unique(codes, return_index=True)
+    seen = seen[np.argsort(first, kind='stable')]
+    counts = np.bincount(codes, minlength=len(values.cat.categories))[seen]
+    index = pd.Index(np.asarray(values.cat.categories[seen], dtype=object),
+                     name=values.name)
+    return pd.Series(counts, index=index, name='count').sort_values(ascending=False)
+
+
+def size_order(values):
+    """Positions that order ``values`` by group size, largest group first.
+
+    Groups of the same size are ordered by value and rows within a group
+    keep their order; missing values come last. Works on the codes of a
+    categorical (or of ``factorize`` otherwise): a bincount gives each
+    group's size and rank, and a stable sort on the small integer rank is a
+    radix sort, so no groupby or comparison sort of the rows is needed.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, groups = values.cat.codes.to_numpy(), len(values.cat.categories)
+    else:
+        codes, uniques = pd.factorize(values, sort=True)
+        groups = len(uniques)
+    sizes = np.bincount(codes[codes >= 0], minlength=groups)
+    rank = np.empty(groups + 1, dtype=np.int64)
+    rank[np.lexsort((np.arange(groups), -sizes))] = np.arange(groups)
+    rank[groups] = groups
+    keys = rank[np.where(codes >= 0, codes, groups)]
+    return np.argsort(keys.astype(np.int16 if groups < 2**15 else np.int64), kind='stable')
+
+
+def widen_floats(df):
+    """Return ``df`` with float32 columns as float64 holding the shortest
+    decimal that round-trips through float32 (2.07, not 2.0699999332), for
+    display and JSON output."""
+    narrow = [name for name in df.columns if df[name].dtype == np.float32]
+    if not narrow:
+        return df
+    return df.assign(**{name: df[name].to_numpy().astype(str).astype(np.float64)
+                        for name in narrow})
@@ -0,0 +1,88 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from catalog import load_catalog
+from sky_index import SkyIndex, chord_degrees, unit_vectors
+
+# Builds the sky index over the catalog and over random float32 catalogs
+# spread evenly over the sphere, checks cone, box and nearest-star searches
+# against brute force (including regions across RA 0h/24h and over the
+# poles), and prints the median time per search. Run from data/:
+#     python sky_benchmark.py [rows ...]
+
+sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+queries = 200
+rng = np.random.default_rng(0)
+
+
+def random_sky(size):
+    z = rng.uniform(-1, 1, size)
+    return pd.DataFrame({
+        'right_ascension': rng.uniform(0, 24, size).astype(np.float32),
+        'declination': np.degrees(np.arcsin(z)).astype(np.float32),
+    })
+
+
+def random_positions(count):
+    ra = rng.uniform(0, 24, count)
+    dec = np.degrees(np.arcsin(rng.uniform(-1, 1, count)))
+    # Some right next to 0h/24h and the poles.
+    ra[:count // 4] = rng.choice([0.01, 23.99], count // 4)
+    dec[count // 4:count // 2] = rng.choice([-89.5, 89.5], count // 2 - count // 4)
+    return ra, dec
+
+
+def median_ms(times):
+    return float(np.median(times)) * 1000
+
+
+def check(name, data):
+    start = time.perf_counter()
+    index = SkyIndex(data)
+    build = time.perf_counter() - start
+
+    points = unit_vectors(data['right_ascension'], data['declination'])
+    ra_values = data['right_ascension']
+    dec_values = data['declination']
+    timings = {'cone': [], 'box': [], 'nearest': []}
+    for ra, dec in zip(*random_positions(queries)):
+        chords = np.linalg.norm(points - unit_vectors(ra, dec), axis=1)
+
+        radius = rng.uniform(0.1, 10)
+        start = time.perf_counter()
+        found = index.cone(ra, dec, radius)
+        timings['cone'].append(time.perf_counter() - start)
+        expected = np.flatnonzero(chords <= 2 * np.sin(np.radians(radius) / 2))
+        assert np.array_equal(found, expected), (name, 'cone', ra, dec, radius)
+
+        ra_range = (float(np.mod(ra - 0.5, 24)), float(np.mod(ra + 0.5, 24)))
+        dec_range = (max(dec - 5, -90), min(dec + 5, 90))
+        start = time.perf_counter()
+        found = index.box(ra_range, dec_range)
+        timings['box'].append(time.perf_counter() - start)
+        if ra_range[0] > ra_range[1]:
+            in_ra = (ra_values >= ra_range[0]) | (ra_values <= ra_range[1])
+        else:
+            in_ra = ra_values.between(*ra_range)
+        expected = np.flatnonzero(in_ra & dec_values.between(*dec_range))
+        assert np.array_equal(found, expected), (name, 'box', ra_range, dec_range)
+
+        start = time.perf_counter()
+        distances, found = index.nearest(ra, dec, 10)
+        timings['nearest'].append(time.perf_counter() - start)
+        expected = np.lexsort((np.arange(len(chords)), chords))[:10]
+        assert np.array_equal(found, expected), (name, 'nearest', ra, dec)
+        assert np.allclose(distances, chord_degrees(chords[expected]))
+
+    print(f"{name:<10} {len(data):>10,} {build:>8.2f} s "
+          + " ".join(f"{median_ms(timings[kind]):>10.3f}" for kind in timings))
+
+
+print(f"{'catalog':<10} {'rows':>10} {'build':>10} {'cone ms':>10} {'box ms':>10} {'nearest ms':>10}")
+check('stars', load_catalog('catalog', mmap_mode=None)[0])
+for size in sizes:
+    check('random', random_sky(size))
+print("Sky index checks passed.")
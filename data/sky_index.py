@@ -0,0 +1,149 @@
+import numpy as np
+
+
+def unit_vectors(ra, dec):
+    """Points on the unit sphere for right ascensions in hours and
+    declinations in degrees, one row of ``(x, y, z)`` per star."""
+    ra = np.radians(np.asarray(ra, dtype=np.float64) * 15)
+    dec = np.radians(np.asarray(dec, dtype=np.float64))
+    cos_dec = np.cos(dec)
+    return np.stack([cos_dec * np.cos(ra), cos_dec * np.sin(ra), np.sin(dec)], axis=-1)
+
+
+def chord_degrees(chords):
+    """Angular separations in degrees from straight-line distances between
+    unit vectors."""
+    return np.degrees(2 * np.arcsin(np.clip(chords / 2, 0, 1)))
+
+
+def _spans(starts, stops):
+    """The positions in every ``[start, stop)`` span, concatenated."""
+    lengths = stops - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum())
+
+
+class SkyIndex:
+    """Equal-area tiling of the sky over a star catalog.
+
+    The sky is cut into ``bands`` declination bands of equal area (equal
+    steps in sin(dec)), and every band into ``2 * bands`` tiles of equal
+    right-ascension width, so all tiles cover the same solid angle. The
+    stars are kept sorted by tile: a search only reads the stars of the
+    tiles its region overlaps and checks those exactly. There are enough
+    bands for tiles to hold about ``stars_per_tile`` stars on average.
+
+    Right ascension is in hours and declination in degrees, as in the
+    catalog. Results are row positions (for ``DataFrame.iloc``); regions
+    across RA 0h/24h and around the poles are searched like any other.
+    Stars without coordinates are never found. Besides the frame's own
+    coordinate columns, the index holds one int32 row position per star.
+    """
+
+    def __init__(self, df, stars_per_tile=64):
+        self.size = len(df)
+        self.dtypes = {column: df[column].dtype for column in ['right_ascension', 'declination']}
+        self.ra = df['right_ascension'].to_numpy()
+        self.dec = df['declination'].to_numpy()
+        self.bands = max(1, int(round(np.sqrt(self.size / stars_per_tile / 2))))
+        self.tiles_per_band = 2 * self.bands
+
+        known = np.flatnonzero(~(np.isnan(self.ra) | np.isnan(self.dec)))
+        tiles = self.tile(self.ra[known], self.dec[known])
+        self.order = known[np.argsort(tiles, kind='stable')]
+        self.order = self.order.astype(np.int32 if self.size < 2 ** 31 else np.int64)
+        counts = np.bincount(tiles, minlength=self.bands * self.tiles_per_band)
+        self.starts = np.concatenate([[0], np.cumsum(counts)])
+
+    def band(self, dec):
+        band = np.floor((np.sin(np.radians(np.asarray(dec, dtype=np.float64))) + 1) / 2 * self.bands)
+        return np.clip(band, 0, self.bands - 1).astype(np.intp)
+
+    def tile(self, ra, dec):
+        cell = np.floor(np.mod(np.asarray(ra, dtype=np.float64), 24) / 24 * self.tiles_per_band)
+        cell = np.clip(cell, 0, self.tiles_per_band - 1).astype(np.intp)
+        return self.band(dec) * self.tiles_per_band + cell
+
+    def normalize(self, column, bounds):
+        """Round bounds to the dtype of ``column``, as ``StarIndex`` does,
+        so a float32 catalog is compared like ``Series.between`` would."""
+        dtype = self.dtypes[column]
+        return tuple(float(dtype.type(bound)) if dtype == np.float32 else float(bound)
+                     for bound in bounds)
+
+    def candidates(self, dec_low, dec_high, ra_start=None, ra_stop=None):
+        """Positions, in tile order, of the stars in every tile overlapping
+        declinations ``[dec_low, dec_high]`` and right ascensions
+        ``[ra_start, ra_stop]``, which may run below 0h or past 24h; without
+        an RA span, whole bands. A tile of slack either side absorbs
+        rounding at tile edges."""
+        if dec_low > dec_high:
+            return np.empty(0, dtype=np.intp)
+        bands = np.arange(max(int(self.band(dec_low)) - 1, 0),
+                          min(int(self.band(dec_high)) + 1, self.bands - 1) + 1)
+        n = self.tiles_per_band
+        if ra_start is None or ra_stop - ra_start >= 24:
+            cells = [(0, n)]
+        else:
+            first = int(np.floor(ra_start / 24 * n)) - 1
+            count = min(int(np.floor(ra_stop / 24 * n)) + 2 - first, n)
+            first %= n
+            cells = ([(first, first + count)] if first + count <= n
+                     else [(first, n), (0, first + count - n)])
+        starts = np.concatenate([self.starts[bands * n + low] for low, _ in cells])
+        stops = np.concatenate([self.starts[bands * n + high] for _, high in cells])
+        return _spans(starts, stops)
+
+    def box(self, ra_range, dec_range):
+        """Sorted row positions of the stars with right ascension in
+        ``ra_range`` and declination in ``dec_range`` (inclusive on both
+        ends). An RA range whose low end is above its high end wraps
+        through 0h: ``(23, 1)`` is the two hours either side of it."""
+        ra_low, ra_high = self.normalize('right_ascension', ra_range)
+        dec_low, dec_high = self.normalize('declination', dec_range)
+        wraps = ra_low > ra_high
+        found = self.order[self.candidates(dec_low, dec_high, ra_low,
+                                           ra_high + 24 if wraps else ra_high)]
+        ra = self.ra[found]
+        dec = self.dec[found]
+        in_ra = (ra >= ra_low) | (ra <= ra_high) if wraps else (ra >= ra_low) & (ra <= ra_high)
+        return np.sort(found[in_ra & (dec >= dec_low) & (dec <= dec_high)])
+
+    def search_cone(self, ra, dec, radius):
+        """Chord distances and row positions, unordered, of the stars within
+        ``radius`` degrees of ``(ra, dec)``."""
+        radius = min(float(radius), 180.0)
+        dec_low, dec_high = dec - radius, dec + radius
+        if dec_low <= -90 or dec_high >= 90:
+            # The cap covers a pole, so every right ascension.
+            found = self.order[self.candidates(max(dec_low, -90), min(dec_high, 90))]
+        else:
+            # Widest point of the cap, in hours either side of its centre.
+            half = np.degrees(np.arcsin(np.sin(np.radians(radius)) / np.cos(np.radians(dec)))) / 15
+            found = self.order[self.candidates(dec_low, dec_high, ra - half, ra + half)]
+        points = unit_vectors(self.ra[found], self.dec[found])
+        chords = np.linalg.norm(points - unit_vectors(ra, dec), axis=1)
+        inside = chords <= 2 * np.sin(np.radians(radius) / 2)
+        return chords[inside], found[inside]
+
+    def cone(self, ra, dec, radius):
+        """Sorted row positions of the stars within ``radius`` degrees of
+        ``(ra, dec)``."""
+        return np.sort(self.search_cone(ra, dec, radius)[1])
+
+    def nearest(self, ra, dec, n=5):
+        """Angular distances in degrees and row positions of the ``n`` stars
+        closest to ``(ra, dec)``, closest first."""
+        n = min(n, len(self.order))
+        if n <= 0:
+            return np.empty(0), np.empty(0, dtype=np.intp)
+        # Start from a cap that would hold about 2n stars if they were spread
+        # evenly, and double it until it holds n.
+        radius = np.degrees(np.arccos(max(1 - 4 * n / len(self.order), -1.0)))
+        while True:
+            chords, positions = self.search_cone(ra, dec, radius)
+            if len(positions) >= n or radius >= 180:
+                break
+            radius *= 2
+        closest = np.lexsort((positions, chords))[:n]
+        return chord_degrees(chords[closest]), positions[closest]
@@ -0,0 +1,109 @@
+import numpy as np
+
+INDEXED_COLUMNS = [
+    'right_ascension',
+    'declination',
+    'apparent_magnitude',
+    'absolute_magnitude',
+    'distance_light_year',
+]
+
+
+class StarIndex:
+    """Sorted per-attribute index over a star catalog.
+
+    For every indexed column we keep the column values in ascending order
+    together with the row positions that produce that order. A range on one
+    column is then two binary searches, and a conjunction of ranges starts
+    from the column whose range matches the fewest rows and checks the
+    remaining columns only on those candidates. Gathering and sorting
+    candidates costs several times more per row than comparing whole
+    columns, so when even the most selective range spans more than
+    ``mask_fraction`` of the rows, every column is compared instead.
+
+    The sorted copies keep the columns' dtypes and row positions are int32,
+    and the unsorted columns are the frame's own arrays (memory-mapped ones
+    stay shared), so a float32 column costs 8 bytes per row.
+
+    Results are row positions (for ``DataFrame.iloc``) in catalog order, so
+    ``data.iloc[index.query(ranges)]`` is identical to filtering ``data``
+    itself with ``Series.between`` on every column. Against the source CSV
+    that holds for bounds of up to four decimals (all the app queries
+    with), since ``compact_catalog`` keeps a column float64 unless float32
+    matches the same rows there; a bound with more digits, between two
+    values closer than float32 resolution, may still differ.
+    """
+
+    def __init__(self, df, columns=INDEXED_COLUMNS, mask_fraction=0.15):
+        self.size = len(df)
+        self.mask_fraction = mask_fraction
+        position_dtype = np.int32 if len(df) < 2 ** 31 else np.int64
+        self.values = {}
+        self.order = {}
+        self.sorted_values = {}
+        self.dtypes = {}
+        for column in columns:
+            self.dtypes[column] = df[column].dtype
+            values = df[column].to_numpy()
+            order = np.argsort(values, kind='stable').astype(position_dtype)
+            self.values[column] = values
+            self.order[column] = order
+            self.sorted_values[column] = values[order]
+
+    def normalize(self, ranges):
+        """Round range bounds to the dtype of their column.
+
+        For a float32 column a bound like 1.1 has to be compared as
+        float32(1.1), exactly as ``Series.between`` on the float32 column
+        would compare it; rounded bounds also make the binary searches
+        (done in float64) agree with the comparisons (done in float32).
+        """
+        return {column: tuple(float(self.dtypes[column].type(bound))
+                              if self.dtypes[column] == np.float32 else bound
+                              for bound in bounds)
+                for column, bounds in ranges.items()}
+
+    def span(self, column, low, high):
+        """Return the ``[start, stop)`` slice of the sorted column inside
+        ``[low, high]``, bounds already normalized. NaNs sort last and never
+        fall inside a range."""
+        sorted_values = self.sorted_values[column]
+        # In the column's dtype: searchsorted would otherwise convert the
+        # whole column to the bounds' type first.
+        low, high = sorted_values.dtype.type(low), sorted_values.dtype.type(high)
+        start = np.searchsorted(sorted_values, low, side='left')
+        stop = np.searchsorted(sorted_values, high, side='right')
+        return start, max(start, stop)
+
+    def query(self, ranges):
+        """Return the sorted row positions matching every ``column: (low,
+        high)`` range in ``ranges`` (inclusive on both ends)."""
+        if not ranges:
+            return np.arange(self.size)
+
+        ranges = self.normalize(ranges)
+        spans = {column: self.span(column, *bounds)
+                 for column, bounds in ranges.items()}
+        driver = min(spans, key=lambda column: spans[column][1] - spans[column][0])
+        start, stop = spans[driver]
+        if stop - start > self.mask_fraction * self.size:
+            return self.mask(ranges)
+        positions = self.order[driver][start:stop]
+
+        for column, (low, high) in ranges.items():
+            if column == driver or len(positions) == 0:
+                continue
+            values = self.values[column][positions]
+            positions = positions[(values >= low) & (values <= high)]
+
+        return np.sort(positions)
+
+    def mask(self, ranges):
+        """Return the sorted row positions matching already normalized
+        ``ranges`` by comparing whole columns."""
+        keep = np.ones(self.size, dtype=bool)
+        for column, (low, high) in ranges.items():
+            values = self.values[column]
+            keep &= values >= low
+            keep &= values <= high
+        return np.flatnonzero(keep)
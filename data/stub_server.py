@@ -0,0 +1,98 @@
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+# A local stand-in for the stars API, serving the stars in stars_data.csv
+# with the same paging: ?constellation=<name>&offset=<n> returns up to 30
+# stars as a JSON list, and an empty list past the end. It can be made
+# slow and unreliable to exercise retries. Run from data/:
+#     python stub_server.py [port]
+# and point the fetcher at it:
+#     python obtain_data.py --url http://127.0.0.1:8000/v1/stars
+
+
+class StubStarsAPI(ThreadingHTTPServer):
+    """Serves ``stars`` (a frame with one row per star) on ``/v1/stars``.
+
+    ``failure_rate`` of the requests fail at random with a 500, 503 or 429,
+    ``latency`` seconds are added to every response, and ``requests`` counts
+    what was asked for.
+    """
+
+    daemon_threads = True
+    page_size = 30
+
+    def __init__(self, stars, port=0, failure_rate=0.0, latency=0.0, seed=0):
+        super().__init__(('127.0.0.1', port), _Handler)
+        self.pages = {constellation: group.to_dict('records')
+                      for constellation, group in stars.groupby('constellation', sort=False)}
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/v1/stars'
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        with server.lock:
+            server.requests += 1
+            fail = server.random.random() < server.failure_rate
+            if fail:
+                server.failures += 1
+                status = server.random.choice([500, 503, 429])
+        if server.latency:
+            time.sleep(server.latency)
+
+        if url.path != '/v1/stars':
+            return self._send(404, {'error': 'Not found'})
+        if not self.headers.get('X-Api-Key'):
+            return self._send(400, {'error': 'Missing API key'})
+        if fail:
+            return self._send(status, {'error': 'Try again later'})
+
+        constellation = query.get('constellation', [''])[0]
+        offset = int(query.get('offset', ['0'])[0])
+        stars = server.pages.get(constellation, [])
+        self._send(200, stars[offset:offset + server.page_size])
+
+    def _send(self, status, body):
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def load_stars(path='stars_data.csv'):
+    """The stars of a previous download, as the API returned them."""
+    return pd.read_csv(path, dtype=str, keep_default_na=False).drop(columns='index')
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    server = StubStarsAPI(load_stars(), port=port)
+    print(f"Serving {sum(map(len, server.pages.values()))} stars on {server.url}")
+    server.serve_forever()
@@ -0,0 +1,99 @@
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+BATCH_COLUMNS = ['name', 'right_ascension', 'declination']
+
+
+def read_batches(source, fmt='csv', chunksize=10_000):
+    """Yield frames of at most ``chunksize`` ``name``/``right_ascension``/
+    ``declination`` rows from a text file object.
+
+    ``fmt`` is ``'csv'``, ``'ndjson'`` (one JSON object per line) or
+    ``'json'`` (an array of objects). CSV and NDJSON are read incrementally;
+    a JSON array has to be parsed whole before it is split into chunks.
+    """
+    if fmt == 'csv':
+        reader = pd.read_csv(source, chunksize=chunksize)
+    elif fmt == 'ndjson':
+        reader = pd.read_json(source, lines=True, chunksize=chunksize)
+    elif fmt == 'json':
+        frame = pd.DataFrame(json.load(source))
+        reader = (frame.iloc[start:start + chunksize]
+                  for start in range(0, len(frame), chunksize))
+    else:
+        raise ValueError(f"Unknown batch format: {fmt!r}")
+
+    for chunk in reader:
+        missing = [column for column in BATCH_COLUMNS if column not in chunk.columns]
+        if missing:
+            raise ValueError(f"Missing column(s): {', '.join(missing)}")
+        yield chunk[BATCH_COLUMNS].reset_index(drop=True)
+
+
+def classify_batches(predictor, batches, threshold=0.05):
+    """Add ``constellation`` and ``probabilities`` columns to every batch.
+
+    Each batch costs a single ``predict_proba`` call; the predicted
+    constellation is the most probable class. Rows whose coordinates are
+    missing or not numeric are passed through with empty predictions.
+    """
+    classes = np.asarray(predictor.classes_)
+    for chunk in batches:
+        coords = chunk[['right_ascension', 'declination']].apply(pd.to_numeric, errors='coerce')
+        valid = coords.notna().all(axis=1).to_numpy()
+
+        result = chunk.copy()
+        result['constellation'] = None
+        result['probabilities'] = ''
+        if valid.any():
+            proba = predictor.predict_proba(coords[valid])
+            result.loc[valid, 'constellation'] = classes[proba.argmax(axis=1)]
+            result.loc[valid, 'probabilities'] = [
+                '; '.join(f"{classes[idx]}: {row[idx]*100:.2f}%"
+                          for idx in np.flatnonzero(row > threshold))
+                for row in proba
+            ]
+        yield result
+
+
+def stream_predictions(predictor, source, fmt='csv', out_fmt='csv',
+                       chunksize=10_000, stats=None):
+    """Classify ``source`` chunk by chunk and yield the results as text.
+
+    ``out_fmt`` is ``'csv'`` or ``'ndjson'``. Only one chunk is held in
+    memory at a time. If ``stats`` is a dict it is kept up to date with
+    ``rows``, ``seconds`` and ``rows_per_second``, all 0 until the first
+    chunk is done (and after, for a source without rows).
+    """
+    start = time.perf_counter()
+    rows = 0
+    if stats is not None:
+        stats.update(rows=0, seconds=0.0, rows_per_second=0.0)
+    for index, result in enumerate(classify_batches(
+            predictor, read_batches(source, fmt, chunksize))):
+        if out_fmt == 'csv':
+            text = result.to_csv(index=False, header=index == 0)
+        else:
+            text = result.to_json(orient='records', lines=True, force_ascii=False)
+            if not text.endswith('\n'):
+                text += '\n'
+
+        rows += len(result)
+        if stats is not None:
+            seconds = time.perf_counter() - start
+            stats.update(rows=rows, seconds=seconds,
+                         rows_per_second=rows / seconds if seconds else 0.0)
+        yield text
+
+
+def batch_format(name):
+    """Guess the batch format from a file name or a content type."""
+    name = name.lower()
+    if 'ndjson' in name or name.endswith('.jsonl'):
+        return 'ndjson'
+    if 'json' in name:
+        return 'json'
+    return 'csv'
@@ -0,0 +1,78 @@
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import load
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import StandardScaler
+
+from spherical import SphericalKNN
+
+# Compares the flat scaled-(RA, Dec) KNN against SphericalKNN on the real
+# catalog and on synthetic catalogs of 10k to 1M stars, made by scattering
+# copies of the real stars by up to half a degree. Run from models/.
+
+sizes = [10_000, 100_000, 1_000_000]
+queries = 200
+rng = np.random.default_rng(1432)
+
+data = pd.read_csv('../data/cleaned_data.csv')
+features = data[['right_ascension', 'declination']]
+target = data['constellation']
+
+
+def scatter(n):
+    rows = rng.integers(0, len(data), n)
+    ra = features['right_ascension'].to_numpy()[rows]
+    dec = features['declination'].to_numpy()[rows]
+    dec = np.clip(dec + rng.uniform(-0.5, 0.5, n), -90, 90)
+    ra = (ra + rng.uniform(-0.5, 0.5, n) / 15 / np.maximum(np.cos(np.radians(dec)), 0.05)) % 24
+    return (pd.DataFrame({'right_ascension': ra, 'declination': dec}),
+            target.to_numpy()[rows])
+
+
+def query_latency(predict, X_test):
+    start = time.perf_counter()
+    for i in range(queries):
+        predict(X_test.iloc[[i]])
+    return (time.perf_counter() - start) / queries * 1000
+
+
+def report(name, n, model, X_test, y_test):
+    accuracy = accuracy_score(y_test, model.predict(X_test))
+    latency = query_latency(lambda row: (model.predict(row), model.predict_proba(row)), X_test)
+    print(f"{n:>9,} {name:<10} accuracy {accuracy:.3f}  query {latency:.2f} ms")
+
+
+class FlatKNN:
+    def __init__(self, scaler, knn):
+        self.scaler = scaler
+        self.knn = knn
+
+    def predict(self, X):
+        return self.knn.predict(self.scaler.transform(X))
+
+    def predict_proba(self, X):
+        return self.knn.predict_proba(self.scaler.transform(X))
+
+
+X_train, X_test, y_train, y_test = train_test_split(features, target, test_size=0.2, random_state=1432)
+report('shipped', len(data), FlatKNN(load('scaler.joblib'), load('knn_model.joblib')), X_test, y_test)
+report('spherical', len(data), SphericalKNN(n_neighbors=15).fit(X_train, y_train), X_test, y_test)
+
+for n in sizes:
+    X, y = scatter(n)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=2000, random_state=1432)
+
+    scaler = StandardScaler().fit(X_train)
+    start = time.perf_counter()
+    flat = FlatKNN(scaler, KNeighborsClassifier(n_neighbors=15).fit(scaler.transform(X_train), y_train))
+    print(f"{n:>9,} flat       fit {time.perf_counter() - start:.2f} s")
+    report('flat', n, flat, X_test, y_test)
+
+    start = time.perf_counter()
+    spherical = SphericalKNN(n_neighbors=15).fit(X_train, y_train)
+    print(f"{n:>9,} spherical  fit {time.perf_counter() - start:.2f} s")
+    report('spherical', n, spherical, X_test, y_test)
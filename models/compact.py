@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+try:
+    from .spherical import neighbour_vote
+except ImportError:
+    from spherical import neighbour_vote
+
+
+class CompactKNN:
+    """The scaled (RA, Dec) KNN model as plain NumPy arrays.
+
+    ``export`` writes the fitted ``StandardScaler`` and
+    ``KNeighborsClassifier`` to a directory of ``.npy`` files: the scaled
+    training coordinates, int-coded labels, the class names and the scaler
+    mean and scale. ``load`` memory-maps them, so loading is nearly free and
+    every worker on a host shares the same pages through the OS page cache.
+    Small queries are answered by brute force over the mapped training set;
+    queries of more than ``brute_max_queries`` rows build a private KD-tree
+    on first use. Predictions match the exported estimator either way.
+    """
+
+    brute_max_queries = 64
+
+    def __init__(self, fit_X, labels, classes, mean, scale, n_neighbors=15,
+                 weights='uniform'):
+        self.fit_X = fit_X
+        self.labels = labels
+        self.classes_ = classes
+        self.mean = mean
+        self.scale = scale
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self._tree = None
+
+    @staticmethod
+    def export(scaler, knn, directory):
+        if knn.effective_metric_ != 'euclidean':
+            raise ValueError(f"Only euclidean KNN models can be exported, not {knn.effective_metric_!r}")
+        # Written next to the old export and swapped in whole: servers that
+        # have the old arrays memory-mapped keep them, as their files are
+        # unlinked rather than overwritten.
+        target = Path(directory)
+        directory = target.with_name(target.name + '.part')
+        shutil.rmtree(directory, ignore_errors=True)
+        directory.mkdir(parents=True)
+        np.save(directory / 'fit_X.npy', np.ascontiguousarray(knn._fit_X, dtype=np.float64))
+        np.save(directory / 'labels.npy', knn._y.astype(np.int32))
+        np.save(directory / 'classes.npy', knn.classes_.astype(str))
+        np.save(directory / 'mean.npy', scaler.mean_)
+        np.save(directory / 'scale.npy', scaler.scale_)
+        with open(directory / 'params.json', 'w') as f:
+            json.dump({'n_neighbors': knn.n_neighbors, 'weights': knn.weights}, f)
+        previous = target.with_name(target.name + '.old')
+        shutil.rmtree(previous, ignore_errors=True)
+        if target.exists():
+            os.replace(target, previous)
+        os.replace(directory, target)
+        shutil.rmtree(previous, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        directory = Path(directory)
+        with open(directory / 'params.json') as f:
+            params = json.load(f)
+        return cls(np.load(directory / 'fit_X.npy', mmap_mode=mmap_mode),
+                   np.load(directory / 'labels.npy', mmap_mode=mmap_mode),
+                   np.load(directory / 'classes.npy'),
+                   np.load(directory / 'mean.npy'),
+                   np.load(directory / 'scale.npy'),
+                   **params)
+
+    def transform(self, X):
+        if hasattr(X, 'columns'):
+            X = X[['right_ascension', 'declination']]
+        return (np.asarray(X, dtype=np.float64).reshape(-1, 2) - self.mean) / self.scale
+
+    def kneighbors(self, X, n_neighbors=None):
+        """Return distances and training-row indices of the nearest
+        neighbours in scaled space, closest first."""
+        k = n_neighbors or self.n_neighbors
+        queries = self.transform(X)
+        if len(queries) > self.brute_max_queries:
+            if self._tree is None:
+                from sklearn.neighbors import KDTree
+                self._tree = KDTree(np.asarray(self.fit_X))
+            return self._tree.query(queries, k=k)
+
+        block = max(1, 2 ** 22 // len(self.fit_X))
+        distances = np.empty((len(queries), k))
+        indices = np.empty((len(queries), k), dtype=np.intp)
+        for start in range(0, len(queries), block):
+            stop = start + block
+            squared = ((queries[start:stop, None, :] - self.fit_X[None, :, :]) ** 2).sum(axis=2)
+            nearest = np.argpartition(squared, k - 1, axis=1)[:, :k]
+            order = np.argsort(np.take_along_axis(squared, nearest, axis=1), axis=1, kind='stable')
+            indices[start:stop] = np.take_along_axis(nearest, order, axis=1)
+            distances[start:stop] = np.sqrt(np.take_along_axis(squared, indices[start:stop], axis=1))
+        return distances, indices
+
+    def predict_proba(self, X):
+        distances, indices = self.kneighbors(X)
+        return neighbour_vote(np.asarray(self.labels)[indices], distances, len(self.classes_),
+                              self.weights)
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
@@ -1,3 +1,7 @@
+import argparse
+import os
+import time
+
 import pandas as pd
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.model_selection import train_test_split
@@ -5,31 +9,122 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import accuracy_score
 import numpy as np
 from joblib import dump
+from sklearn.pipeline import make_pipeline
+from spherical import SphericalKNN
+from lookup import PredictionLookup
+from compact import CompactKNN
+from search import FEATURE_SPACES, NEIGHBOURS, WEIGHTS, add_latency, cross_validate, fit_flat, select
+
+# Trains the Prediction-page models and writes them to models/. Run from
+# models/:
+#     python knn.py
+# trains k=15 models on an 80/20 split, as the app has always shipped;
+#     python knn.py --search
+# cross-validates every k, weighting and feature space on all cores, writes
+# search_report.csv and exports the selected configuration fitted on all
+# stars.
+
+
+# RA (hours) and Dec (degrees) between the prediction lookup's grid points;
+# set with --lookup-ra-step and --lookup-dec-step.
+lookup_steps = {'ra_step': 1.0, 'dec_step': 1.0}
+
+
+def export_lookup(predictor, path):
+    # Answers for every slider position on the grid, so the app can skip
+    # the model for on-grid inputs.
+    lookup = PredictionLookup.build(predictor, **lookup_steps)
+    lookup.save(path)
+    print(f"Wrote {path}: {lookup.n_ra} x {lookup.n_dec} points, every "
+          f"{lookup.ra_step:g} h x {lookup.dec_step:g} deg, {os.path.getsize(path) / 1024:.0f} KiB")
+
+
+def export_flat(scaler, knn):
+    dump(scaler, 'scaler.joblib')
+    dump(knn, 'knn_model.joblib')
+    # The same model as memory-mappable arrays, loaded by the app.
+    CompactKNN.export(scaler, knn, 'knn_compact')
+    export_lookup(make_pipeline(scaler, knn), 'prediction_lookup_flat.npz')
+
+
+def export_spherical(spherical_knn):
+    spherical_knn.save('spherical_knn.npz')
+    export_lookup(spherical_knn, 'prediction_lookup_spherical.npz')
+
+
+def search(features, target, folds, workers):
+    start = time.perf_counter()
+    report = cross_validate(features, target, folds=folds, workers=workers)
+    print(f"Cross-validated {len(report)} configurations over {folds} folds "
+          f"in {time.perf_counter() - start:.1f} s")
+    report = add_latency(report, features, target)
+    report = report.sort_values('accuracy', ascending=False)
+    report.to_csv('search_report.csv', index=False)
+    print(report.head(10).to_string(index=False, float_format='{:.4f}'.format))
+
+    chosen = select(report)
+    print(f"Selected {chosen.feature_space} k={chosen.n_neighbors} {chosen.weights}: "
+          f"accuracy {chosen.accuracy:.4f}, query {chosen.latency_ms:.3f} ms")
+    if chosen.feature_space == 'flat':
+        export_flat(*fit_flat(features, target, chosen.n_neighbors, chosen.weights))
+    else:
+        export_spherical(SphericalKNN(n_neighbors=chosen.n_neighbors, weights=chosen.weights)
+                         .fit(features, target))
+        print("Set CELESTIAL_PREDICTOR=spherical to serve it.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train the constellation classifiers.")
+    parser.add_argument('--search', action='store_true',
+                        help="cross-validate %s, k in %s and %s weights, and export the best"
+                             % ('/'.join(FEATURE_SPACES), NEIGHBOURS, '/'.join(WEIGHTS)))
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="processes for the search; all cores by default")
+    parser.add_argument('--data', default='cleaned_data.csv')
+    parser.add_argument('--lookup-ra-step', type=float, default=lookup_steps['ra_step'],
+                        help="hours between prediction lookup grid points; finer grids "
+                             "answer more inputs without the model but are bigger")
+    parser.add_argument('--lookup-dec-step', type=float, default=lookup_steps['dec_step'],
+                        help="degrees between prediction lookup grid points")
+    args = parser.parse_args()
+    lookup_steps.update(ra_step=args.lookup_ra_step, dec_step=args.lookup_dec_step)
+
+    data = pd.read_csv(args.data)
+
+    data['right_ascension'] = pd.to_numeric(data['right_ascension'], errors='coerce')
+    data['declination'] = pd.to_numeric(data['declination'], errors='coerce')
 
-data = pd.read_csv('cleaned_data.csv')
+    features = data[['right_ascension', 'declination']]
+    target = data['constellation']
 
-data['right_ascension'] = pd.to_numeric(data['right_ascension'], errors='coerce')
-data['declination'] = pd.to_numeric(data['declination'], errors='coerce')
+    if args.search:
+        search(features, target, args.folds, args.workers)
+    else:
+        scaler = StandardScaler()
+        features_scaled = scaler.fit_transform(features)
 
-features = data[['right_ascension', 'declination']]
-target = data['constellation']
+        X_train, X_test, y_train, y_test = train_test_split(features_scaled, target, test_size=0.2, random_state=1432)
 
-scaler = StandardScaler()
-features_scaled = scaler.fit_transform(features)
+        print(X_train.shape)
+        print(X_test.shape)
+        print(y_train.shape)
+        print(y_test.shape)
 
-X_train, X_test, y_train, y_test = train_test_split(features_scaled, target, test_size=0.2, random_state=1432)
+        knn = KNeighborsClassifier(n_neighbors=15)
+        knn.fit(X_train, y_train)
 
-print(X_train.shape)
-print(X_test.shape)
-print(y_train.shape)
-print(y_test.shape)
+        y_pred = knn.predict(X_test)
+        accuracy = accuracy_score(y_test, y_pred)
+        print(f"Accuracy: {accuracy:.2f}")
 
-knn = KNeighborsClassifier(n_neighbors=15)
-knn.fit(X_train, y_train)
+        export_flat(scaler, knn)
 
-y_pred = knn.predict(X_test)
-accuracy = accuracy_score(y_test, y_pred)
-print(f"Accuracy: {accuracy:.2f}")
+        # Same split, but neighbours measured by angular separation on the sphere.
+        X_train, X_test, y_train, y_test = train_test_split(features, target, test_size=0.2, random_state=1432)
+        spherical_knn = SphericalKNN(n_neighbors=15)
+        spherical_knn.fit(X_train, y_train)
+        spherical_accuracy = accuracy_score(y_test, spherical_knn.predict(X_test))
+        print(f"Spherical accuracy: {spherical_accuracy:.2f}")
 
-dump(scaler, 'scaler.joblib')  
-dump(knn, 'knn_model.joblib')
+        export_spherical(spherical_knn)
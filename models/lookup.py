@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+
+class PredictionLookup:
+    """Precomputed constellation predictions on a dense RA/Dec grid.
+
+    The Prediction-page sliders only produce whole-hour and whole-degree
+    values, so every answer can be computed ahead of time. Each grid point
+    holds the predicted constellation and the classes whose probability is
+    above ``threshold``, in class order. ``get`` answers in constant time and
+    returns ``None`` for coordinates that are not on the grid, so callers can
+    fall back to the live model. The grid steps are saved with the answers;
+    finer steps answer more inputs from the grid and make a bigger file.
+    """
+
+    def __init__(self, classes, ra_start, ra_step, n_ra, dec_start, dec_step, n_dec,
+                 labels, top_classes, top_probs, threshold=0.05):
+        self.classes = classes
+        self.ra_start = ra_start
+        self.ra_step = ra_step
+        self.n_ra = n_ra
+        self.dec_start = dec_start
+        self.dec_step = dec_step
+        self.n_dec = n_dec
+        self.labels = labels
+        self.top_classes = top_classes
+        self.top_probs = top_probs
+        self.threshold = threshold
+
+    @classmethod
+    def build(cls, predictor, ra_step=1.0, dec_step=1.0, threshold=0.05):
+        """Evaluate ``predictor`` (anything with ``predict``,
+        ``predict_proba`` and ``classes_`` taking raw coordinates) on every
+        grid point from RA 0-24h and Dec -90-90 degrees. Steps that don't
+        divide those spans are evened out to the nearest that do."""
+        n_ra = max(int(round(24 / ra_step)), 1)
+        n_dec = max(int(round(180 / dec_step)), 1)
+        ra_step, dec_step = 24 / n_ra, 180 / n_dec
+        ra_values = np.linspace(0, 24, n_ra + 1)
+        dec_values = np.linspace(-90, 90, n_dec + 1)
+        grid = pd.DataFrame({
+            'right_ascension': np.repeat(ra_values, len(dec_values)),
+            'declination': np.tile(dec_values, len(ra_values)),
+        })
+
+        classes = np.asarray(predictor.classes_)
+        proba = predictor.predict_proba(grid)
+        labels = np.searchsorted(classes, predictor.predict(grid))
+
+        keep = proba > threshold
+        rows, columns = np.nonzero(keep)
+        slots = np.arange(len(rows)) - np.searchsorted(rows, rows)
+        width = int(keep.sum(axis=1).max())
+        top_classes = np.full((len(grid), width), -1, dtype=np.int16)
+        top_probs = np.zeros((len(grid), width))
+        top_classes[rows, slots] = columns
+        top_probs[rows, slots] = proba[rows, columns]
+
+        return cls(classes.astype(str), 0.0, ra_step, len(ra_values),
+                   -90.0, dec_step, len(dec_values),
+                   labels.astype(np.int16), top_classes, top_probs, threshold)
+
+    def get(self, ra, dec):
+        """Return ``(constellation, {class: probability})`` for a grid point,
+        or ``None`` if ``(ra, dec)`` is off the grid."""
+        i = (ra - self.ra_start) / self.ra_step
+        j = (dec - self.dec_start) / self.dec_step
+        ri, rj = round(i), round(j)
+        if abs(i - ri) > 1e-9 or abs(j - rj) > 1e-9:
+            return None
+        if not (0 <= ri < self.n_ra and 0 <= rj < self.n_dec):
+            return None
+
+        row = ri * self.n_dec + rj
+        breakdown = {self.classes[c]: p
+                     for c, p in zip(self.top_classes[row], self.top_probs[row])
+                     if c >= 0}
+        return self.classes[self.labels[row]], breakdown
+
+    def save(self, path):
+        np.savez_compressed(
+            path, classes=self.classes,
+            ra=np.array([self.ra_start, self.ra_step, self.n_ra]),
+            dec=np.array([self.dec_start, self.dec_step, self.n_dec]),
+            labels=self.labels, top_classes=self.top_classes,
+            top_probs=self.top_probs, threshold=self.threshold)
+
+    @classmethod
+    def load(cls, path):
+        archive = np.load(path, allow_pickle=False)
+        ra_start, ra_step, n_ra = archive['ra']
+        dec_start, dec_step, n_dec = archive['dec']
+        return cls(archive['classes'], float(ra_start), float(ra_step), int(n_ra),
+                   float(dec_start), float(dec_step), int(n_dec),
+                   archive['labels'], archive['top_classes'], archive['top_probs'],
+                   float(archive['threshold']))
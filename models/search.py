@@ -0,0 +1,135 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import KFold
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import StandardScaler
+
+try:
+    from .compact import CompactKNN
+    from .spherical import SphericalKNN, neighbour_vote
+except ImportError:
+    from compact import CompactKNN
+    from spherical import SphericalKNN, neighbour_vote
+
+FEATURE_SPACES = ['flat', 'spherical']
+NEIGHBOURS = list(range(1, 32, 2))
+WEIGHTS = ['uniform', 'distance']
+
+
+def fit_flat(X, y, n_neighbors=15, weights='uniform'):
+    """The shipped model: a ``StandardScaler`` and a ``KNeighborsClassifier``
+    on the scaled (RA, Dec)."""
+    scaler = StandardScaler().fit(X)
+    knn = KNeighborsClassifier(n_neighbors=n_neighbors, weights=weights)
+    return scaler, knn.fit(scaler.transform(X), y)
+
+
+def fold_neighbours(space, X_train, y_train, X_test, n_neighbors):
+    """Distances and training-row indices of the ``n_neighbors`` nearest
+    training stars of every test star, closest first, measured as the model
+    for ``space`` measures them."""
+    if space == 'flat':
+        scaler, knn = fit_flat(X_train, y_train, n_neighbors)
+        return knn.kneighbors(scaler.transform(X_test))
+    return SphericalKNN(n_neighbors=n_neighbors).fit(X_train, y_train).kneighbors(X_test)
+
+
+def score_fold(space, X, codes, n_classes, train, test, neighbours=NEIGHBOURS,
+               weights=WEIGHTS):
+    """Correct predictions on one fold for every ``(n_neighbors, weights)``.
+
+    The neighbours are found once, for the largest k; each smaller k votes
+    with the first k of them, which is what a model fitted with that k
+    finds (up to the order of stars at exactly the same distance).
+    """
+    distances, indices = fold_neighbours(space, X.iloc[train], codes[train], X.iloc[test],
+                                         max(neighbours))
+    labels = codes[train][indices]
+    correct = {}
+    for k, weighting in product(neighbours, weights):
+        proba = neighbour_vote(labels[:, :k], distances[:, :k], n_classes, weighting)
+        correct[space, k, weighting] = int((proba.argmax(axis=1) == codes[test]).sum())
+    return correct
+
+
+def cross_validate(X, y, spaces=FEATURE_SPACES, neighbours=NEIGHBOURS, weights=WEIGHTS,
+                   folds=5, workers=None, seed=1432):
+    """Accuracy of every combination of feature space, k and weighting,
+    over ``folds`` folds. One job per (feature space, fold), spread over
+    ``workers`` processes (all cores by default). Returns a frame with the
+    mean and standard deviation of the fold accuracies per combination."""
+    classes, codes = np.unique(np.asarray(y), return_inverse=True)
+    splits = list(KFold(folds, shuffle=True, random_state=seed).split(X))
+    jobs = [(space, X, codes, len(classes), train, test, neighbours, weights)
+            for space in spaces for train, test in splits]
+
+    workers = workers or os.cpu_count()
+    if workers > 1:
+        with ProcessPoolExecutor(min(workers, len(jobs))) as pool:
+            results = list(pool.map(score_fold, *zip(*jobs)))
+    else:
+        results = [score_fold(*job) for job in jobs]
+
+    rows = []
+    for job, correct in zip(jobs, results):
+        test = job[5]
+        for (space, k, weighting), count in correct.items():
+            rows.append((space, k, weighting, count / len(test)))
+    scores = pd.DataFrame(rows, columns=['feature_space', 'n_neighbors', 'weights', 'accuracy'])
+    report = scores.groupby(['feature_space', 'n_neighbors', 'weights'])['accuracy'] \
+        .agg(accuracy='mean', accuracy_std='std').reset_index()
+    report['folds'] = folds
+    return report
+
+
+def fit_model(X, y, feature_space, n_neighbors, weights):
+    """The model the app would serve for this configuration, fitted on all
+    of ``X``: a ``CompactKNN`` or a ``SphericalKNN``."""
+    if feature_space == 'flat':
+        scaler, knn = fit_flat(X, y, n_neighbors, weights)
+        with tempfile.TemporaryDirectory() as tmp:
+            CompactKNN.export(scaler, knn, os.path.join(tmp, 'knn_compact'))
+            return CompactKNN.load(os.path.join(tmp, 'knn_compact'), mmap_mode=None)
+    return SphericalKNN(n_neighbors=n_neighbors, weights=weights).fit(X, y)
+
+
+def query_latency(model, X, queries=200):
+    """Median milliseconds for one single-star ``predict_proba``, as the
+    Prediction page asks."""
+    rows = X.sample(queries, replace=len(X) < queries, random_state=0)
+    times = []
+    for i in range(queries):
+        start = time.perf_counter()
+        model.predict_proba(rows.iloc[[i]])
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000
+
+
+def add_latency(report, X, y, queries=200):
+    """Add each configuration's single-query latency to ``report``. Timed
+    one at a time in this process, so the pool doesn't skew them."""
+    report['latency_ms'] = [
+        query_latency(fit_model(X, y, row.feature_space, row.n_neighbors, row.weights), X, queries)
+        for row in report.itertuples()]
+    return report
+
+
+def select(report, latency_slack=0.1):
+    """The configuration to export, as a row of ``report``.
+
+    Candidates are those within one standard error of the best accuracy
+    (the one-standard-error rule). Of those, the most accurate one is taken
+    among the ones at most ``latency_slack`` slower than the fastest, so
+    timing noise doesn't decide between equally fast models.
+    """
+    best = report.loc[report['accuracy'].idxmax()]
+    threshold = best['accuracy'] - best['accuracy_std'] / np.sqrt(best['folds'])
+    candidates = report[report['accuracy'] >= threshold]
+    fast = candidates[candidates['latency_ms'] <= candidates['latency_ms'].min() * (1 + latency_slack)]
+    return fast.loc[fast['accuracy'].idxmax()]
@@ -0,0 +1,92 @@
+import numpy as np
+
+
+def unit_vectors(X):
+    """Map ``(right_ascension [hours], declination [degrees])`` rows to
+    points on the unit sphere. Accepts a DataFrame with those two columns or
+    an ``(n, 2)`` array."""
+    if hasattr(X, 'columns'):
+        X = X[['right_ascension', 'declination']]
+    coords = np.asarray(X, dtype=np.float64).reshape(-1, 2)
+    ra = np.radians(coords[:, 0] * 15)
+    dec = np.radians(coords[:, 1])
+    cos_dec = np.cos(dec)
+    return np.column_stack([cos_dec * np.cos(ra), cos_dec * np.sin(ra), np.sin(dec)])
+
+
+def neighbour_vote(labels, distances, n_classes, weights='uniform'):
+    """Class probabilities from the labels of each row's nearest neighbours,
+    weighted like ``KNeighborsClassifier`` (``'uniform'`` or
+    ``'distance'``, where exact matches take all the weight)."""
+    if weights == 'distance':
+        with np.errstate(divide='ignore'):
+            votes = 1 / distances
+        exact = np.isinf(votes)
+        votes[exact.any(axis=1)] = exact[exact.any(axis=1)]
+    else:
+        votes = np.ones_like(distances, dtype=np.float64)
+
+    proba = np.zeros((len(labels), n_classes))
+    rows = np.repeat(np.arange(len(labels)), labels.shape[1])
+    np.add.at(proba, (rows, labels.ravel()), votes.ravel())
+    return proba / proba.sum(axis=1, keepdims=True)
+
+
+class SphericalKNN:
+    """K-nearest-neighbours constellation classifier on the celestial sphere.
+
+    Training stars are indexed as unit vectors in a KD-tree, so neighbours
+    are found by true angular separation: stars either side of RA 0h/24h
+    and around the poles are close, unlike in scaled (RA, Dec) space.
+    ``predict``, ``predict_proba`` and ``classes_`` behave like
+    ``KNeighborsClassifier``, but take raw coordinates instead of
+    ``StandardScaler`` output.
+    """
+
+    def __init__(self, n_neighbors=15, weights='uniform', leaf_size=40):
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self.leaf_size = leaf_size
+
+    def fit(self, X, y):
+        # sklearn is only imported once a tree is built, so modules that just
+        # use neighbour_vote (models/compact.py) don't pay for it.
+        from sklearn.neighbors import KDTree
+
+        self.classes_, self._labels = np.unique(np.asarray(y), return_inverse=True)
+        self._tree = KDTree(unit_vectors(X), leaf_size=self.leaf_size)
+        return self
+
+    def kneighbors(self, X, n_neighbors=None):
+        """Return angular distances in degrees and training-row indices of the
+        nearest stars, closest first."""
+        chord, indices = self._tree.query(unit_vectors(X), k=n_neighbors or self.n_neighbors)
+        return np.degrees(2 * np.arcsin(np.clip(chord / 2, 0, 1))), indices
+
+    def predict_proba(self, X):
+        distances, indices = self.kneighbors(X)
+        return neighbour_vote(self._labels[indices], distances, len(self.classes_),
+                              self.weights)
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def save(self, path):
+        """Write the training stars and settings to a ``.npz`` archive."""
+        data = self._tree.get_arrays()[0]
+        np.savez(path, points=data, labels=self._labels, classes=self.classes_.astype(str),
+                 n_neighbors=self.n_neighbors, weights=self.weights,
+                 leaf_size=self.leaf_size)
+
+    @classmethod
+    def load(cls, path):
+        from sklearn.neighbors import KDTree
+
+        archive = np.load(path, allow_pickle=False)
+        model = cls(n_neighbors=int(archive['n_neighbors']),
+                    weights=str(archive['weights']),
+                    leaf_size=int(archive['leaf_size']))
+        model.classes_ = archive['classes']
+        model._labels = archive['labels']
+        model._tree = KDTree(archive['points'], leaf_size=model.leaf_size)
+        return model
@@ -0,0 +1,94 @@
+import threading
+from collections import OrderedDict
+
+
+class PlotCache:
+    """Process-wide LRU cache of rendered plot images.
+
+    Entries are PNG bytes keyed by any hashable tuple, e.g.
+    ``(constellation, attribute, catalog_version)``. The cache is bounded by
+    the total size of the stored images; the least recently used images are
+    evicted first. ``hits``, ``misses`` and ``evictions`` count lookups since
+    the cache was created so it can be sized from a running server.
+
+    Values other than bytes can be cached by passing ``sizeof``, a function
+    estimating an entry's size in bytes.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, sizeof=len):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        with self._lock:
+            image = self._entries.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def put(self, key, image):
+        with self._lock:
+            if key in self._entries:
+                self.size -= self.sizeof(self._entries.pop(key))
+            if self.sizeof(image) > self.max_bytes:
+                return
+            self._entries[key] = image
+            self.size += self.sizeof(image)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= self.sizeof(evicted)
+                self.evictions += 1
+
+    def get_or_render(self, key, render):
+        image = self.get(key)
+        if image is None:
+            image = render()
+            self.put(key, image)
+        return image
+
+    def invalidate(self, keep=None):
+        """Drop every entry, or only those for which ``keep(key)`` is false."""
+        with self._lock:
+            for key in list(self._entries):
+                if keep is None or not keep(key):
+                    self.size -= self.sizeof(self._entries.pop(key))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+def prewarm(cache, jobs):
+    """Render ``(key, render)`` jobs into ``cache`` on a daemon thread,
+    skipping keys that are already cached. Returns the started thread."""
+    def run():
+        for key, render in jobs:
+            if key not in cache:
+                cache.put(key, render())
+
+    thread = threading.Thread(target=run, name='plot-cache-prewarm', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,173 @@
+import io
+import os
+import sys
+import weakref
+
+import numpy as np
+
+# seaborn and matplotlib make up most of the app's import time, so they are
+# imported on the first render; see _seaborn().
+_sns = None
+
+# Figures created by this module that have not been garbage collected yet.
+_live_figures = weakref.WeakSet()
+
+# Callables invoked with figure_stats() after every render.
+render_hooks = []
+
+# Title prefix, x-axis label and average-line label for each Stars-page plot.
+STAR_PLOTS = {
+    'right_ascension': ('Right Ascension of stars in ', 'Right Ascension (hour)',
+                        'Average Right Ascension: {:.2f}'),
+    'declination': ('Declination of stars in ', 'Declination (degrees)',
+                    'Average Declination: {:.2f}'),
+    'apparent_magnitude': ('Apparent Magnitude of stars in ', 'Apparent Magnitude',
+                           'Average Apparent Magnitude: {:.2f}'),
+    'absolute_magnitude': ('Absolute Magnitude of stars in ', 'Absolute Magnitude',
+                           'Average Absolute Magnitude: {:.2f}'),
+    'distance_light_year': ('Distance from Earth of stars in ',
+                            'Distance from Earth (light years)',
+                            'Average Distance from Earth: {:.2f} light years'),
+}
+
+
+def downsample(values, max_points):
+    """Pick ``max_points`` evenly spaced order statistics of ``values``.
+
+    The result always includes the minimum and maximum and follows the
+    quantiles of the full distribution, and the same input always gives the
+    same sample.
+    """
+    values = np.sort(values[~np.isnan(values)])
+    if len(values) <= max_points:
+        return values
+    return values[np.linspace(0, len(values) - 1, max_points).round().astype(int)]
+
+
+def star_plot_png(stars, constellation, attribute, average, dpi=100,
+                  max_points=5000, large_mode='density'):
+    """Render the strip plot of ``attribute`` for one constellation to PNG
+    bytes, with a dashed line at ``average``.
+
+    Constellations with more than ``max_points`` stars are drawn as a
+    histogram (``large_mode='density'``) or as a strip plot of a
+    ``downsample`` of the stars (``large_mode='sample'``), so rendering time
+    does not grow with the number of stars. ``average`` is always the mean
+    of the full set.
+    """
+    title, xlabel, label = STAR_PLOTS[attribute]
+
+    sns = _seaborn()
+    fig = _new_figure(figsize=(10, 5))
+    ax = fig.subplots()
+    if len(stars) <= max_points:
+        sns.stripplot(x=attribute, data=stars, jitter=True, size=3, ax=ax)
+    elif large_mode == 'density':
+        values = stars[attribute].to_numpy(dtype=np.float64)
+        ax.hist(values[~np.isnan(values)], bins=100, histtype='stepfilled')
+        ax.set_ylabel('Number of stars')
+    elif large_mode == 'sample':
+        sample = downsample(stars[attribute].to_numpy(dtype=np.float64), max_points)
+        sns.stripplot(x=sample, jitter=True, size=3, ax=ax)
+        ax.text(0.01, 0.98, f'{len(sample):,} of {len(stars):,} stars shown',
+                transform=ax.transAxes, va='top', fontsize=9)
+    else:
+        raise ValueError(f"Unknown large_mode: {large_mode!r}")
+    ax.set_title(title + constellation)
+    ax.set_xlabel(xlabel)
+    ax.grid()
+    ax.axvline(average, color='red', linestyle='--', label=label.format(average))
+    ax.legend()
+    return _release_png(fig, dpi)
+
+
+def constellation_counts_png(constellation_counts, dpi=100):
+    """Render the Constellations-page bar chart of star counts to PNG bytes.
+
+    ``constellation_counts`` is a frame with ``constellation`` and ``count``
+    columns, largest first.
+    """
+    sns = _seaborn()
+    fig = _new_figure(figsize=(12, 5))
+    ax = fig.subplots()
+    sns.barplot(
+        x='constellation', y='count', hue='constellation', data=constellation_counts,
+        palette='viridis', legend=False, ax=ax
+    )
+    ax.set_title('Number of Stars per Constellation')
+    ax.set_xlabel('Constellation')
+    ax.set_ylabel('Number of Stars')
+    if not constellation_counts.empty:
+        ax.set_ylim(0, constellation_counts['count'].max() * 1.1)
+
+    ax.set_xticks(range(len(constellation_counts['constellation'])))
+    ax.set_xticklabels(
+        constellation_counts['constellation'], rotation=45, ha='right')
+
+    ax.grid()
+    for p in ax.patches:
+        ax.annotate(format(p.get_height(), '.0f'),
+                    (p.get_x() + p.get_width() / 2., p.get_height()),
+                    ha='center', va='center',
+                    xytext=(0, 5),
+                    textcoords='offset points',
+                    fontsize=9)
+    return _release_png(fig, dpi)
+
+
+def _seaborn():
+    """Import seaborn and apply the app's theme on first use."""
+    global _sns
+    if _sns is None:
+        import seaborn
+        seaborn.set_theme(style="white")
+        _sns = seaborn
+    return _sns
+
+
+def _new_figure(figsize):
+    """Create a Figure outside pyplot's global figure manager, so nothing
+    keeps it alive once rendering is done."""
+    from matplotlib.figure import Figure
+
+    _seaborn()
+    fig = Figure(figsize=figsize)
+    _live_figures.add(fig)
+    return fig
+
+
+def _release_png(fig, dpi):
+    """Save ``fig`` to PNG bytes and clear it, breaking the artist reference
+    cycles so its memory is returned without waiting for a full GC."""
+    try:
+        fig.tight_layout()
+        with io.BytesIO() as buf:
+            fig.savefig(buf, format='png', dpi=dpi)
+            return buf.getvalue()
+    finally:
+        fig.clear()
+        if render_hooks:
+            stats = figure_stats()
+            for hook in render_hooks:
+                hook(stats)
+
+
+def process_rss():
+    """Current resident set size of this process in bytes. Falls back to the
+    peak RSS where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def figure_stats():
+    pyplot = sys.modules.get('matplotlib.pyplot')
+    return {
+        'live_figures': len(_live_figures),
+        'pyplot_figures': len(pyplot.get_fignums()) if pyplot else 0,
+        'rss_bytes': process_rss(),
+    }
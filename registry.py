@@ -0,0 +1,156 @@
+import atexit
+import threading
+import traceback
+from pathlib import Path
+
+
+class Registry:
+    """Versioned artifacts (the catalog, the model) that can be replaced
+    while the app is serving.
+
+    Each artifact is registered with a ``load`` function and the files it
+    is loaded from. ``get`` returns the current value; ``watch`` starts a
+    background thread that reloads an artifact when its files change. The
+    new value is loaded and warmed up entirely on that thread and then
+    swapped in with a single assignment, so a request sees either the old
+    value or the new one, never a mix, and never waits for a load.
+
+    ``generation(name)`` counts the swaps of an artifact since startup.
+    Callbacks added with ``subscribe`` run after every swap, on the thread
+    that swapped, e.g. to drop cache entries of the old version or to tell
+    sessions to redo what they derived from the old value.
+    """
+
+    def __init__(self):
+        self._artifacts = {}
+        self._subscribers = []
+        self._stop = threading.Event()
+        self.reloads = 0
+        self.failures = 0
+
+    def register(self, name, load, paths, lazy=False, version=None, warm=None):
+        """Register artifact ``name``, built by ``load()`` from ``paths``.
+
+        A ``lazy`` artifact is loaded on first ``get`` and only reloaded
+        once it has been loaded. ``version(value)`` identifies the content
+        of a value, so a reload that yields the same version is not swapped
+        in; ``warm(value)`` runs on a new value before it is swapped in.
+        """
+        self._artifacts[name] = {
+            'load': load,
+            'paths': [Path(path).resolve() for path in paths],
+            'version': version,
+            'warm': warm,
+            'value': None,
+            'generation': 0,
+            'lock': threading.Lock(),
+        }
+        if not lazy:
+            self.get(name)
+
+    def get(self, name):
+        artifact = self._artifacts[name]
+        value = artifact['value']
+        if value is None:
+            with artifact['lock']:
+                if artifact['value'] is None:
+                    artifact['value'] = artifact['load']()
+                value = artifact['value']
+        return value
+
+    def loaded(self, name):
+        return self._artifacts[name]['value'] is not None
+
+    def generation(self, name):
+        return self._artifacts[name]['generation']
+
+    def version(self, name):
+        artifact = self._artifacts[name]
+        value = artifact['value']
+        if value is None or artifact['version'] is None:
+            return None
+        return artifact['version'](value)
+
+    def subscribe(self, callback):
+        """Call ``callback(name, old, new)`` after every swap."""
+        self._subscribers.append(callback)
+
+    def reload(self, name):
+        """Load artifact ``name`` again and swap it in if it changed.
+        Returns whether it was swapped."""
+        artifact = self._artifacts[name]
+        with artifact['lock']:
+            old = artifact['value']
+            new = artifact['load']()
+            version = artifact['version']
+            if old is not None and version is not None and version(old) == version(new):
+                return False
+            if artifact['warm'] is not None:
+                artifact['warm'](new)
+            artifact['value'] = new
+            artifact['generation'] += 1
+            self.reloads += 1
+        for callback in self._subscribers:
+            callback(name, old, new)
+        return True
+
+    def changed(self, paths):
+        """The loaded artifacts that depend on any of ``paths``."""
+        paths = [Path(path) for path in paths]
+        names = []
+        for name, artifact in self._artifacts.items():
+            if artifact['value'] is None:
+                continue
+            for path in paths:
+                if any(path == watched or watched in path.parents
+                       for watched in artifact['paths']):
+                    names.append(name)
+                    break
+        return names
+
+    def watch(self, settle_ms=1000):
+        """Reload artifacts whose files change, on a daemon thread.
+
+        Changes are collected until none arrive for ``settle_ms``, so an
+        artifact written file by file is loaded once, when complete. A load
+        that fails (say, on a file still being written) keeps the current
+        value and is retried on the next change.
+        """
+        # Parents rather than the paths themselves, since a directory that
+        # is replaced whole would take its watch with it.
+        directories = {path.parent for artifact in self._artifacts.values()
+                       for path in artifact['paths']}
+
+        def run():
+            from watchfiles import watch
+
+            for changes in watch(*directories, step=settle_ms, debounce=10 * settle_ms,
+                                 stop_event=self._stop, raise_interrupt=False):
+                for name in self.changed(path for _, path in changes):
+                    try:
+                        self.reload(name)
+                    except Exception:
+                        self.failures += 1
+                        traceback.print_exc()
+
+        thread = threading.Thread(target=run, name='registry-watch', daemon=True)
+        thread.start()
+        # The watcher must be stopped before the interpreter shuts down
+        # rather than torn down with the daemon thread mid-wait.
+        atexit.register(self.stop, thread)
+        return thread
+
+    def stop(self, thread=None):
+        self._stop.set()
+        if thread is not None:
+            thread.join()
+
+    def stats(self):
+        return {
+            'artifacts': {name: {'loaded': artifact['value'] is not None,
+                                 'generation': artifact['generation'],
+                                 'version': self.version(name)}
+                          for name, artifact in self._artifacts.items()},
+            'reloads': self.reloads,
+            'failures': self.failures,
+        }
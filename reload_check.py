@@ -0,0 +1,91 @@
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from data.catalog import load_catalog, write_catalog
+from data.star_index import StarIndex
+from registry import Registry
+
+# Rewrites a copy of the catalog over and over while reader threads query it
+# through a watching Registry, as sessions of a running app would. Checks
+# that every rewrite is swapped in, that readers always see a complete
+# catalog of one version, and that queries don't stall during swaps. Run
+# from the repository root:
+#     python reload_check.py [rewrites]
+
+rewrites = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+readers = 4
+ranges = {'right_ascension': (6.0, 16.0), 'declination': (-30.0, 40.0)}
+
+base, _ = load_catalog(Path(__file__).parent / "data" / "catalog", mmap_mode=None)
+tmp = Path(tempfile.mkdtemp())
+catalog_path = tmp / "catalog"
+rows = {write_catalog(base, catalog_path)['version']: len(base)}
+
+
+def load():
+    data, version = load_catalog(catalog_path)
+    return {'data': data, 'version': version, 'index': StarIndex(data)}
+
+
+registry = Registry()
+registry.register('catalog', load, [catalog_path], version=lambda catalog: catalog['version'])
+registry.watch(settle_ms=200)
+
+stop = threading.Event()
+latencies = []
+errors = []
+
+
+def read():
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            catalog = registry.get('catalog')
+            positions = catalog['index'].query(ranges)
+            matched = catalog['data'].iloc[positions]
+            assert len(catalog['data']) == rows[catalog['version']]
+            assert matched['right_ascension'].between(*ranges['right_ascension']).all()
+        except Exception as e:
+            errors.append(e)
+        latencies.append(time.perf_counter() - start)
+
+
+threads = [threading.Thread(target=read) for _ in range(readers)]
+for thread in threads:
+    thread.start()
+# Reader latency with nothing being reloaded, to compare against.
+time.sleep(2)
+idle = len(latencies)
+
+swap_times = []
+for rewrite in range(1, rewrites + 1):
+    frame = base.iloc[:len(base) - rewrite].reset_index(drop=True)
+    start = time.perf_counter()
+    manifest = write_catalog(frame, catalog_path)
+    rows[manifest['version']] = manifest['rows']
+    while registry.version('catalog') != manifest['version']:
+        assert time.perf_counter() - start < 10, "new catalog was not swapped in"
+        time.sleep(0.01)
+    swap_times.append(time.perf_counter() - start)
+
+stop.set()
+for thread in threads:
+    thread.join()
+registry.stop()
+shutil.rmtree(tmp)
+
+latencies = np.array(latencies) * 1000
+print(f"{rewrites} rewrites swapped in after {np.median(swap_times):.2f} s median, "
+      f"{max(swap_times):.2f} s max; {registry.stats()}")
+for label, sample in [('idle', latencies[:idle]), ('reloading', latencies[idle:])]:
+    print(f"{label:<10} {len(sample):>7,} reader queries: p50 {np.percentile(sample, 50):.2f} ms, "
+          f"p99 {np.percentile(sample, 99):.2f} ms, max {sample.max():.2f} ms")
+assert not errors, errors[:3]
+assert registry.generation('catalog') == rewrites
+print("Reload checks passed.")
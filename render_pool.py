@@ -0,0 +1,54 @@
+import asyncio
+import functools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class RenderPool:
+    """Runs blocking plot rendering off the Shiny event loop.
+
+    ``backend`` is ``'thread'`` or ``'process'``; at most ``max_workers``
+    renders run at once and the rest wait in the executor queue. With the
+    process backend the rendered function and its arguments must be
+    picklable, so hand it module-level functions such as those in
+    ``plots``.
+    """
+
+    def __init__(self, backend='thread', max_workers=2):
+        if backend == 'thread':
+            self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                               thread_name_prefix='render')
+        elif backend == 'process':
+            self.executor = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            raise ValueError(f"Unknown render backend: {backend!r}")
+        self.backend = backend
+        self.max_workers = max_workers
+        self.in_flight = 0
+        self.completed = 0
+
+    @property
+    def queue_depth(self):
+        """Renders submitted but not yet picked up by a worker."""
+        return max(0, self.in_flight - self.max_workers)
+
+    async def run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        try:
+            return await loop.run_in_executor(
+                self.executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+
+    def stats(self):
+        return {
+            'backend': self.backend,
+            'max_workers': self.max_workers,
+            'in_flight': self.in_flight,
+            'queue_depth': self.queue_depth,
+            'completed': self.completed,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
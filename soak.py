@@ -0,0 +1,52 @@
+import gc
+import sys
+from pathlib import Path
+
+import pandas as pd
+import seaborn as sns
+
+from data.constellations import partition_by_constellation
+from plots import STAR_PLOTS, star_plot_png, constellation_counts_png, figure_stats
+
+# Renders Stars and Constellations pages over and over and checks that the
+# process does not keep growing. Run from the repository root:
+#     python soak.py [pages]
+
+pages = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+warmup = 50
+max_growth = 50 * 1024 * 1024
+# seaborn can keep the last figure or two reachable for a while; anything
+# beyond a handful means figures are leaking.
+max_live_figures = 4
+
+sns.set_theme(style="white")
+data = pd.read_csv(Path(__file__).parent / "data" / "cleaned_data.csv")
+partitions = partition_by_constellation(data)
+constellations = list(partitions)
+counts = data['constellation'].value_counts().reset_index()
+
+baseline = None
+for page in range(pages):
+    constellation = constellations[page % len(constellations)]
+    stars = partitions[constellation]
+    for attribute in STAR_PLOTS:
+        star_plot_png(stars, constellation, attribute, stars[attribute].mean())
+    constellation_counts_png(counts)
+
+    if page == warmup:
+        gc.collect()
+        baseline = figure_stats()
+        print(f"Baseline after {warmup} pages: {baseline}")
+    elif page % 250 == 0:
+        print(f"Page {page}: {figure_stats()}")
+
+gc.collect()
+final = figure_stats()
+growth = final['rss_bytes'] - baseline['rss_bytes']
+print(f"Final after {pages} pages: {final}")
+print(f"RSS growth since baseline: {growth / 1024 / 1024:.1f} MiB")
+
+assert final['pyplot_figures'] == 0, "figures leaked into pyplot's figure manager"
+assert final['live_figures'] <= max_live_figures, \
+    f"{final['live_figures']} figures still alive"
+assert growth < max_growth, f"RSS grew by {growth} bytes"
@@ -0,0 +1,62 @@
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+# Measures how long a fresh process takes to import app.py, which modules
+# that time goes to, and what is deferred to the first plot and the first
+# prediction. Every measurement runs in a new interpreter, so nothing is
+# already imported or cached. Run from the repository root:
+#     python startup_profile.py [runs]
+
+runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+root = Path(__file__).parent
+top = 15
+
+
+def python(code, *flags):
+    result = subprocess.run([sys.executable, *flags, '-c', code], cwd=root,
+                            capture_output=True, text=True, check=True)
+    return result
+
+
+# Wall time of `import app`, best and median of `runs` cold processes.
+timer = "import time; start = time.perf_counter(); import app; print(time.perf_counter() - start)"
+times = [float(python(timer).stdout) for _ in range(runs)]
+print(f"import app: best {min(times) * 1000:.0f} ms, "
+      f"median {statistics.median(times) * 1000:.0f} ms over {runs} runs")
+
+# -X importtime reports the self time of every module; add it up per
+# top-level package.
+packages = defaultdict(int)
+for line in python('import app', '-X', 'importtime').stderr.splitlines():
+    if not line.startswith('import time:') or 'self [us]' in line:
+        continue
+    self_us, _, name = line[len('import time:'):].split('|')
+    packages[name.strip().split('.')[0]] += int(self_us)
+total = sum(packages.values())
+print(f"\nImport time by package ({total / 1000:.0f} ms total):")
+for name, us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+    print(f"  {name:<20} {us / 1000:8.1f} ms  {us / total:6.1%}")
+
+# Work deferred until first use.
+first_use = """
+import sys, time
+import app
+for module in ['seaborn', 'matplotlib', 'PIL', 'sklearn', 'scipy', 'joblib']:
+    print(f"  {module:<20} {'loaded' if module in sys.modules else 'not loaded'} after import")
+catalog = app.current_catalog()
+constellation = next(iter(catalog['partitions']))
+start = time.perf_counter()
+app.render_star_plot(catalog, constellation, 'right_ascension')
+print(f"  first star plot      {(time.perf_counter() - start) * 1000:8.1f} ms")
+start = time.perf_counter()
+app.render_star_plot(catalog, constellation, 'declination')
+print(f"  second star plot     {(time.perf_counter() - start) * 1000:8.1f} ms")
+start = time.perf_counter()
+app.predict_constellation(5.5, 0.25)
+print(f"  first prediction     {(time.perf_counter() - start) * 1000:8.1f} ms")
+"""
+print("\nDeferred to first use:")
+print(python(first_use).stdout, end='')